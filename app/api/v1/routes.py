@@ -1,44 +1,56 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from app.services.ocr_service import OCRService
-from app.services.embedding_service import EmbeddingService
+from app.services.embedding_service import BatchingEmbedder, EmbeddingService
 from app.services.matching_service import MatchingService
 from app.services.shelf_life_service import ShelfLifeService
 from app.models.schemas import ReceiptResponse, ItemResult
 from app.core.config import settings
+from app.utils.image_preprocessing import open_verified
+from app.utils.uploads import read_upload
 from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import io
 
 router = APIRouter()
 
 ocr_service = OCRService(engine=settings.ocr_engine)
 shelf_life_service = ShelfLifeService(settings.foodkeeper_data_path)
-embedding_service = EmbeddingService()
+embedding_service = EmbeddingService(
+    onnx_path=settings.embedding_onnx_path or None,
+    cache_path=settings.canonical_embs_path or None,
+)
+if settings.embedding_batch_wait_ms > 0:
+    # Requests matched in parallel executor threads share one encode + matmul
+    embedding_service = BatchingEmbedder(
+        embedding_service,
+        max_batch_size=settings.embedding_batch_size,
+        max_wait_time=settings.embedding_batch_wait_ms / 1000,
+    )
 matching_service = MatchingService(embedding=embedding_service, shelf_life=shelf_life_service, threshold=0.8)
 
+# Decode, OCR and matching are CPU-bound; run them here so the event loop stays free.
+executor = ThreadPoolExecutor(max_workers=settings.ocr_workers, thread_name_prefix="ocr")
+
 @router.get("/health")
 async def health():
     return {"status": "ok"}
 
 
-@router.post("/process_receipt", response_model=ReceiptResponse)
-async def process_receipt(file: UploadFile = File(...)):
-    # Validate file is an image by mime-type and content sniff
-    if not file or not file.filename:
-        raise HTTPException(status_code=400, detail="No file provided")
-    if file.content_type and not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="Invalid file type. Please upload an image.")
-    content = await file.read()
+def _open_image(content: io.BytesIO) -> Image.Image:
     try:
-        image = Image.open(io.BytesIO(content))
+        return open_verified(content)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid image file.")
 
+
+def _process_receipt_bytes(content: io.BytesIO) -> ReceiptResponse:
+    image = _open_image(content)
     try:
         ocr_text = ocr_service.extract_text(image)
         item_names = ocr_service.parse_items(ocr_text)
         results: list[ItemResult] = []
-        for original in item_names:
-            match = matching_service.match_item(original)
+        for original, match in zip(item_names, matching_service.match_items(item_names)):
             if isinstance(match, tuple) and match[0] is None:
                 suggestions = match[1]
                 results.append(ItemResult(original_text=original, matched_item=None, shelf_life=None, suggestions=suggestions))
@@ -53,6 +65,25 @@ async def process_receipt(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _ocr_preview_bytes(content: io.BytesIO, max_lines: int) -> dict:
+    image = _open_image(content)
+    text = ocr_service.extract_text(image)
+    lines = text.splitlines() if text else []
+    return {"line_count": len(lines), "preview": lines[:max(1, max_lines)]}
+
+
+@router.post("/process_receipt", response_model=ReceiptResponse)
+async def process_receipt(file: UploadFile = File(...)):
+    # Validate file is an image by mime-type and content sniff
+    if not file or not file.filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+    if file.content_type and not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload an image.")
+    content = await read_upload(file, settings.max_upload_bytes)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, _process_receipt_bytes, content)
+
+
 @router.post("/ocr_preview")
 async def ocr_preview(file: UploadFile = File(...), max_lines: int = 20):
     # Quick debug endpoint to inspect raw OCR output lines
@@ -60,12 +91,6 @@ async def ocr_preview(file: UploadFile = File(...), max_lines: int = 20):
         raise HTTPException(status_code=400, detail="No file provided")
     if file.content_type and not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Invalid file type. Please upload an image.")
-    content = await file.read()
-    try:
-        image = Image.open(io.BytesIO(content))
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid image file.")
-
-    text = ocr_service.extract_text(image)
-    lines = text.splitlines() if text else []
-    return {"line_count": len(lines), "preview": lines[:max(1, max_lines)]}
\ No newline at end of file
+    content = await read_upload(file, settings.max_upload_bytes)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, _ocr_preview_bytes, content, max_lines)
\ No newline at end of file
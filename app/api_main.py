@@ -1,15 +1,32 @@
 import logging
+import os
+import ahocorasick
+import cachetools
+import orjson
 import pytesseract
 from PIL import Image
-from fastapi import FastAPI, UploadFile, File, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, UploadFile, File, HTTPException, status
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from pydantic import BaseModel
 import io
+import re
 import json
+import hashlib
+import asyncio
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from app.core.config import settings
+from app.utils.image_preprocessing import open_verified, prepare_for_ocr
+from app.utils.tesseract import image_to_string
+from app.utils.uploads import read_upload, reject_oversized_body
+
 # Enhanced shelf life database based on USDA FoodKeeper data
 SHELF_LIFE_DATA = {
     # Bakery items
@@ -279,34 +296,107 @@ FOOD_ITEMS = {
     'potato': 'Potatoes'
 }
 
-def match_food_item(ocr_text: str) -> tuple[str, dict]:
+# Skip patterns for non-food receipt lines (totals, payment, store metadata)
+SKIP_PATTERNS = [
+    'total', 'subtotal', 'tax', 'walmart', 'store', 'thank you', 
+    'receipt', 'cashier', 'card', 'cash', 'change', 'balance',
+    'member', 'save', 'debit', 'credit',
+    'account', 'network', 'ref #', 'appr code', 'eft', 'payment',
+    'manager', 'phone', 'address', 'layaway', 'electronics'
+]
+
+# Aho-Corasick automatons built once at import: each receipt line is scanned in
+# a single pass instead of one substring check per alias / skip pattern.
+FOOD_AUTOMATON = ahocorasick.Automaton()
+for _alias, _food_name in FOOD_ITEMS.items():
+    FOOD_AUTOMATON.add_word(_alias, (_alias, _food_name))
+FOOD_AUTOMATON.make_automaton()
+
+# Inverted index for word-level partial matches: token -> (food_name, hits),
+# hits being how many of that food's aliases contain the token.
+# Tokens shared by several foods (store brands like 'gv', 'organic') carry no
+# signal on their own and are left out, as are numbers and single letters that
+# collide with receipt price/tax flags.
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+_token_foods = defaultdict(Counter)
+for _alias, _food_name in FOOD_ITEMS.items():
+    for _token in TOKEN_RE.findall(_alias):
+        if len(_token) > 1 and not _token.isdigit():
+            _token_foods[_token][_food_name] += 1
+TOKEN_INDEX: dict[str, tuple[str, int]] = {
+    token: next(iter(foods.items())) for token, foods in _token_foods.items() if len(foods) == 1
+}
+
+SKIP_AUTOMATON = ahocorasick.Automaton()
+for _pattern in SKIP_PATTERNS:
+    SKIP_AUTOMATON.add_word(_pattern, _pattern)
+SKIP_AUTOMATON.make_automaton()
+
+# Store, operator, terminal and transaction codes (st# 02345 op# 009876 te# 09
+# tr# 01234); the '#' is optional since OCR often drops or splits it
+STORE_CODE_RE = re.compile(r'\b(?:st|op|te|tr|tc)\s*#?\s*\d')
+
+# Lines made only of digits and separators (prices, dates, barcodes)
+NONFOOD_RE = re.compile(r'[\d ./-]*\d[\d ./-]*')
+
+def is_skip_line(line_lower: str) -> bool:
+    """True if the (already lowercased) line contains any non-food skip pattern"""
+    return next(SKIP_AUTOMATON.iter(line_lower), None) is not None or STORE_CODE_RE.search(line_lower) is not None
+
+@lru_cache(maxsize=4096)
+def _match_food_name(text_lower: str) -> Optional[str]:
     """
     Enhanced matching for food items with better handling of store brands and variations.
-    Returns tuple of (food_name, shelf_life_dict)
+    Memoized on the lowercased line since lines like "milk" or "eggs" repeat across
+    receipts. Returns the canonical food name, or None when nothing matches.
     """
-    text_lower = ocr_text.lower().strip()
-    
     # Handle specific Great Value peanut butter case
     if 'gv' in text_lower and any(word in text_lower for word in ['pnt', 'peanut', 'buttr', 'butter']):
-        return 'Peanut Butter', SHELF_LIFE_DATA['Peanut Butter']
+        return 'Peanut Butter'
     
     # Try exact match first
     if text_lower in FOOD_ITEMS:
-        food_name = FOOD_ITEMS[text_lower]
-        return food_name, SHELF_LIFE_DATA.get(food_name, {})
-    
-    # Try partial matching for complex items
-    for key, food_name in FOOD_ITEMS.items():
-        if key in text_lower or any(word in text_lower for word in key.split()):
-            return food_name, SHELF_LIFE_DATA.get(food_name, {})
-    
-    # Fallback to generic shelf life
-    generic_shelf_life = {
-        'pantry': 'Check packaging',
-        'fridge': 'Follow use-by date',
-        'freezer': 'Generally 3-6 months'
-    }
-    return ocr_text, generic_shelf_life
+        return FOOD_ITEMS[text_lower]
+    
+    # Aliases contained in the line: prefer the most specific (longest) one
+    best = None
+    for _, (alias, food_name) in FOOD_AUTOMATON.iter(text_lower):
+        if best is None or len(alias) > len(best[0]):
+            best = (alias, food_name)
+    if best is not None:
+        return best[1]
+    
+    # Try partial matching for complex items: score foods by shared alias tokens
+    scores = {}
+    for token in set(TOKEN_RE.findall(text_lower)):
+        hit = TOKEN_INDEX.get(token)
+        if hit:
+            scores[hit[0]] = scores.get(hit[0], 0) + hit[1]
+    if scores:
+        return max(scores, key=scores.get)
+    
+    return None
+
+def match_food_item(ocr_text: str, text_lower: Optional[str] = None) -> tuple[str, dict]:
+    """
+    Match an OCR line to a food item. Pass text_lower when the caller has already
+    lowercased the line. Returns tuple of (food_name, shelf_life_dict)
+    """
+    if text_lower is None:
+        text_lower = ocr_text.lower()
+    food_name = _match_food_name(text_lower.strip())
+    
+    if food_name is None:
+        # Fallback to generic shelf life
+        generic_shelf_life = {
+            'pantry': 'Check packaging',
+            'fridge': 'Follow use-by date',
+            'freezer': 'Generally 3-6 months'
+        }
+        return ocr_text, generic_shelf_life
+    
+    # Copy so callers can never mutate the shared table
+    return food_name, dict(SHELF_LIFE_DATA.get(food_name, {}))
 
 # Pydantic models for API responses
 class ShelfLifeInfo(BaseModel):
@@ -342,8 +432,16 @@ class FoodDatabaseItem(BaseModel):
     aliases: List[str]
     category: str
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+# Tesseract settings shared by every request: LSTM engine, single text block,
+# character whitelist restricted to what appears on receipts
+OCR_CONFIG = r'--oem 3 --psm 6 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789.,/$%#- '
+
+# Honor an explicit tesseract binary path once at startup
+if os.getenv('TESSERACT_CMD'):
+    pytesseract.pytesseract.tesseract_cmd = os.getenv('TESSERACT_CMD')
+
+# Setup logging (WARNING by default; set LOG_LEVEL=INFO for per-item traces)
+logging.basicConfig(level=getattr(logging, settings.log_level.upper(), logging.WARNING))
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
@@ -355,6 +453,21 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Timestamp string reused for up to 100 ms so health probes and responses don't
+# re-format the current time on every call
+_TS_CACHE = ['', 0.0]
+
+def now_iso() -> str:
+    """Current local time in ISO format, cached with ~100 ms granularity"""
+    t = time.time()
+    if t - _TS_CACHE[1] > 0.1:
+        _TS_CACHE[0] = datetime.fromtimestamp(t).isoformat()
+        _TS_CACHE[1] = t
+    return _TS_CACHE[0]
+
+# Refuse uploads whose declared size is already over the cap before the body is read
+app.middleware("http")(reject_oversized_body)
+
 # Add CORS middleware for frontend integration
 app.add_middleware(
     CORSMiddleware,
@@ -364,24 +477,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Category -> keywords; a food belongs to the first category with a keyword in its name
+CATEGORIES = {
+    'Dairy & Eggs': ['Eggs', 'Milk', 'Butter', 'Cheese', 'Yogurt', 'Cream cheese', 'Cottage cheese', 'Sour cream'],
+    'Bakery': ['Bread', 'Rolls', 'Cookies', 'Muffins', 'Crackers'],
+    'Pantry Staples': ['Peanut Butter', 'Coffee', 'Flour', 'Sugar', 'Rice', 'Pasta', 'Beans'],
+    'Meat & Poultry': ['Chicken', 'Beef', 'Pork', 'Ground meat', 'Bacon', 'Ham', 'Hot dogs', 'Lunch meat'],
+    'Seafood': ['Fish', 'Shrimp', 'Crab'],
+    'Produce': ['Apples', 'Bananas', 'Berries', 'Citrus', 'Grapes', 'Melons', 'Onion', 'Potatoes', 'Carrots', 'Tomatoes', 'Broccoli', 'Cauliflower', 'Cabbage', 'Garlic', 'Mushrooms'],
+    'Condiments & Sauces': ['Ketchup', 'Mayonnaise', 'Mustard', 'Salad dressing', 'Soy sauce', 'Honey', 'Vinegar'],
+    'Canned Goods': ['Canned meat', 'Canned fruit', 'Canned vegetables']
+}
+
+# Flattened once, in category order, so the first hit matches the original precedence
+_CATEGORY_KEYWORDS = [(keyword, category) for category, keywords in CATEGORIES.items() for keyword in keywords]
+
+@lru_cache(maxsize=4096)
 def categorize_food_item(food_name: str) -> str:
     """Categorize food items for better organization"""
-    categories = {
-        'Dairy & Eggs': ['Eggs', 'Milk', 'Butter', 'Cheese', 'Yogurt', 'Cream cheese', 'Cottage cheese', 'Sour cream'],
-        'Bakery': ['Bread', 'Rolls', 'Cookies', 'Muffins', 'Crackers'],
-        'Pantry Staples': ['Peanut Butter', 'Coffee', 'Flour', 'Sugar', 'Rice', 'Pasta', 'Beans'],
-        'Meat & Poultry': ['Chicken', 'Beef', 'Pork', 'Ground meat', 'Bacon', 'Ham', 'Hot dogs', 'Lunch meat'],
-        'Seafood': ['Fish', 'Shrimp', 'Crab'],
-        'Produce': ['Apples', 'Bananas', 'Berries', 'Citrus', 'Grapes', 'Melons', 'Onion', 'Potatoes', 'Carrots', 'Tomatoes', 'Broccoli', 'Cauliflower', 'Cabbage', 'Garlic', 'Mushrooms'],
-        'Condiments & Sauces': ['Ketchup', 'Mayonnaise', 'Mustard', 'Salad dressing', 'Soy sauce', 'Honey', 'Vinegar'],
-        'Canned Goods': ['Canned meat', 'Canned fruit', 'Canned vegetables']
-    }
-    
-    for category, items in categories.items():
-        if any(item in food_name for item in items):
+    for keyword, category in _CATEGORY_KEYWORDS:
+        if keyword in food_name:
             return category
     return 'Other'
 
+@lru_cache(maxsize=4096)
 def determine_confidence(raw_text: str, food_name: str) -> str:
     """Determine confidence level of the match"""
     raw_lower = raw_text.lower()
@@ -401,6 +520,29 @@ def determine_confidence(raw_text: str, food_name: str) -> str:
     
     return 'medium'
 
+# Lookup tables for the food-database endpoints, built once from the constant
+# FOOD_ITEMS / SHELF_LIFE_DATA tables instead of on every request
+FOOD_TO_ALIASES: dict[str, list[str]] = defaultdict(list)
+for _alias, _food_name in FOOD_ITEMS.items():
+    FOOD_TO_ALIASES[_food_name].append(_alias)
+
+FOOD_CATEGORY: dict[str, str] = {name: categorize_food_item(name) for name in SHELF_LIFE_DATA}
+
+PRECOMPUTED_DB: List[FoodDatabaseItem] = [
+    FoodDatabaseItem(
+        name=food_name,
+        shelf_life=ShelfLifeInfo(**shelf_life),
+        aliases=FOOD_TO_ALIASES.get(food_name, []),
+        category=FOOD_CATEGORY[food_name]
+    )
+    for food_name, shelf_life in SHELF_LIFE_DATA.items()
+]
+
+# The database is static, so serialize it once and let clients revalidate
+# with If-None-Match instead of re-downloading it
+FOOD_DATABASE_BODY = orjson.dumps([item.model_dump() for item in PRECOMPUTED_DB])
+FOOD_DATABASE_ETAG = f'"{hashlib.md5(FOOD_DATABASE_BODY).hexdigest()}"'
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint with detailed service information"""
@@ -408,7 +550,7 @@ async def health_check():
         status="healthy",
         service="Grocery Receipt OCR & Shelf Life API",
         version="2.1.0",
-        timestamp=datetime.now().isoformat()
+        timestamp=now_iso()
     )
 
 @app.get("/api/v1/health", response_model=HealthResponse)
@@ -416,159 +558,182 @@ async def health_check_v1():
     """Versioned health check endpoint"""
     return await health_check()
 
-@app.post("/api/v1/receipt/process", response_model=ReceiptProcessResponse)
-async def process_receipt(file: UploadFile = File(...)):
+def orjson_response(payload, status_code: int = status.HTTP_200_OK) -> Response:
+    """Encode a plain payload straight to JSON bytes with orjson"""
+    return Response(content=orjson.dumps(payload), status_code=status_code, media_type="application/json")
+
+# Bounded pool for the CPU-bound decode + OCR + matching pipeline. Tesseract
+# runs without the GIL (tesserocr) or in a subprocess (pytesseract), so threads
+# already run OCR in parallel while keeping the event loop (and /health) responsive.
+OCR_EXECUTOR = ThreadPoolExecutor(max_workers=settings.ocr_workers, thread_name_prefix="ocr")
+
+# Mobile clients retry uploads and OCR is deterministic for identical bytes, so
+# cache the extracted text by content hash. Guarded by a lock because the
+# executor threads share it.
+OCR_CACHE = cachetools.LRUCache(maxsize=settings.ocr_cache_size)
+OCR_CACHE_LOCK = threading.Lock()
+
+def _ocr_upload(image_data: io.BytesIO) -> Tuple[str, Tuple[int, int], str]:
+    """OCR an uploaded image, returning (text, image size, image mode).
+
+    Repeat uploads are answered from OCR_CACHE before any decoding; only the
+    header is read for their size and mode. Raises HTTPException(400) for bytes
+    that are not a readable image.
     """
-    Process grocery receipt image and return identified items with shelf life information.
+    with image_data.getbuffer() as view:
+        digest = hashlib.blake2b(view, digest_size=16).digest()
+    with OCR_CACHE_LOCK:
+        raw_text = OCR_CACHE.get(digest)
+    if raw_text is not None:
+        image = Image.open(image_data)
+        logger.info("OCR cache hit: %s pixels, mode: %s", image.size, image.mode)
+        return raw_text, image.size, image.mode
     
-    This is the main endpoint for receipt processing with comprehensive error handling
-    and detailed response structure for frontend integration.
-    """
     try:
-        # Validate file type
-        if not file.content_type or not file.content_type.startswith('image/'):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail={"error": "Invalid file type", "message": "Please upload an image file (JPG, PNG, etc.)"}
-            )
-        
-        logger.info(f"Processing receipt: {file.filename}, type: {file.content_type}")
-        
-        # Read and process image
-        image_data = await file.read()
-        image = Image.open(io.BytesIO(image_data))
-        
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        logger.info(f"Image processed: {image.size} pixels, mode: {image.mode}")
-        
-        # Perform OCR with enhanced settings
-        custom_config = r'--oem 3 --psm 6 -c tesseract_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789.,/$%- '
-        raw_text = pytesseract.image_to_string(image, config=custom_config)
-        
-        logger.info(f"OCR completed: {len(raw_text)} characters extracted")
+        image = open_verified(image_data)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": "Invalid image", "message": "The uploaded file could not be read as an image"}
+        )
+    image_size, image_mode = image.size, image.mode
+    
+    # Grayscale + downscale + binarize: OCR cost scales with pixel count
+    ocr_image = prepare_for_ocr(image, settings.ocr_max_dim, settings.ocr_binarize_threshold, settings.ocr_deskew)
+    
+    logger.info("Image processed: %s pixels, mode: %s, OCR size: %s", image_size, image_mode, ocr_image.size)
+    
+    # Perform OCR with enhanced settings
+    raw_text = image_to_string(ocr_image, config=OCR_CONFIG)
+    with OCR_CACHE_LOCK:
+        OCR_CACHE[digest] = raw_text
+    return raw_text, image_size, image_mode
+
+def _process_receipt_bytes(image_data: io.BytesIO) -> ReceiptProcessResponse:
+    """Decode, OCR and match a receipt image. Runs inside OCR_EXECUTOR."""
+    raw_text, image_size, image_mode = _ocr_upload(image_data)
+    
+    logger.info("OCR completed: %d characters extracted", len(raw_text))
+    
+    # Process text into lines and extract food items
+    lines = [line.strip() for line in raw_text.split('\n') if line.strip()]
+    unique_items = {}
+    
+    item_id_counter = 1
+    
+    for line in lines:
+        # Lowercase once and share it between the skip check and the matcher
+        line_lower = line.lower()
         
-        # Process text into lines and extract food items
-        lines = [line.strip() for line in raw_text.split('\n') if line.strip()]
-        processed_items = []
+        # Skip non-food lines
+        if is_skip_line(line_lower):
+            continue
         
-        # Skip patterns for non-food items
-        skip_patterns = [
-            'total', 'subtotal', 'tax', 'walmart', 'store', 'thank you', 
-            'receipt', 'cashier', 'card', 'cash', 'change', 'balance',
-            'member', 'save', 'tc#', 'st#', 'op#', 'te#', 'debit', 'credit',
-            'account', 'network', 'ref #', 'appr code', 'eft', 'payment',
-            'manager', 'phone', 'address', 'layaway', 'electronics'
-        ]
+        # Skip very short lines, pure numbers, or obvious non-food items
+        if len(line) < 3 or NONFOOD_RE.fullmatch(line):
+            continue
         
-        item_id_counter = 1
+        # Try to match food items
+        food_name, shelf_life = match_food_item(line, line_lower)
         
-        for line in lines:
-            # Skip non-food lines
-            if any(skip_word in line.lower() for skip_word in skip_patterns):
-                continue
+        # Only add items with meaningful shelf life data
+        if shelf_life and shelf_life != {} and not all(v == "Check packaging" for v in shelf_life.values() if v != "Follow use-by date" and v != "Generally 3-6 months"):
+            confidence = determine_confidence(line, food_name)
+            item_id = item_id_counter
+            item_id_counter += 1
+            logger.info("Processed item %d: %r -> %r (%s confidence)", item_id, line, food_name, confidence)
             
-            # Skip very short lines, pure numbers, or obvious non-food items
-            if len(line) < 3 or line.replace(' ', '').replace('.', '').replace('-', '').replace('/', '').isdigit():
+            # Deduplicate similar items (same food_name) as we go: a later match
+            # only replaces an earlier one when it is high confidence
+            if food_name in unique_items and confidence != 'high':
                 continue
             
-            # Try to match food items
-            food_name, shelf_life = match_food_item(line)
-            
-            # Only add items with meaningful shelf life data
-            if shelf_life and shelf_life != {} and not all(v == "Check packaging" for v in shelf_life.values() if v != "Follow use-by date" and v != "Generally 3-6 months"):
-                confidence = determine_confidence(line, food_name)
-                category = categorize_food_item(food_name)
-                
-                processed_item = ProcessedItem(
-                    id=f"item_{item_id_counter:03d}",
-                    raw_text=line,
-                    food_name=food_name,
-                    confidence=confidence,
-                    shelf_life=ShelfLifeInfo(**shelf_life),
-                    category=category
-                )
-                
-                processed_items.append(processed_item)
-                logger.info(f"Processed item {item_id_counter}: '{line}' -> '{food_name}' ({confidence} confidence)")
-                item_id_counter += 1
-        
-        # Deduplicate similar items (same food_name)
-        unique_items = {}
-        for item in processed_items:
-            key = item.food_name
-            if key not in unique_items or item.confidence == 'high':
-                unique_items[key] = item
-        
-        final_items = list(unique_items.values())
+            # Every field comes from our own tables or the OCR'd str line, so
+            # skip Pydantic validation on this per-line hot path
+            unique_items[food_name] = ProcessedItem.model_construct(
+                id=f"item_{item_id:03d}",
+                raw_text=line,
+                food_name=food_name,
+                confidence=confidence,
+                shelf_life=ShelfLifeInfo.model_construct(**shelf_life),
+                category=categorize_food_item(food_name)
+            )
+    
+    logger.info("Final processing result: %d unique food items identified", len(unique_items))
+    
+    # Pydantic collects the dict view into the response's list itself
+    return ReceiptProcessResponse(
+        success=True,
+        timestamp=now_iso(),
+        items_found=len(unique_items),
+        items=unique_items.values(),
+        raw_text_preview=raw_text[:500] + "..." if len(raw_text) > 500 else raw_text,
+        processing_info={
+            "ocr_engine": "Tesseract",
+            "total_lines_processed": len(lines),
+            "raw_items_found": item_id_counter - 1,
+            "unique_items_found": len(unique_items),
+            "image_size": f"{image_size[0]}x{image_size[1]}",
+            "image_mode": image_mode
+        }
+    )
+
+@app.post("/api/v1/receipt/process", response_model=ReceiptProcessResponse)
+async def process_receipt(file: UploadFile = File(...)):
+    """
+    Process grocery receipt image and return identified items with shelf life information.
+    
+    This is the main endpoint for receipt processing with comprehensive error handling
+    and detailed response structure for frontend integration.
+    """
+    # Validate the upload before reading any of its content
+    if not file.filename:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": "No file provided", "message": "Please upload a receipt image"}
+        )
+    if not file.content_type or not file.content_type.startswith('image/'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": "Invalid file type", "message": "Please upload an image file (JPG, PNG, etc.)"}
+        )
+    
+    try:
+        logger.info("Processing receipt: %s, type: %s", file.filename, file.content_type)
         
-        logger.info(f"Final processing result: {len(final_items)} unique food items identified")
+        image_data = await read_upload(file, settings.max_upload_bytes)
         
-        return ReceiptProcessResponse(
-            success=True,
-            timestamp=datetime.now().isoformat(),
-            items_found=len(final_items),
-            items=final_items,
-            raw_text_preview=raw_text[:500] + "..." if len(raw_text) > 500 else raw_text,
-            processing_info={
-                "ocr_engine": "Tesseract",
-                "total_lines_processed": len(lines),
-                "raw_items_found": len(processed_items),
-                "unique_items_found": len(final_items),
-                "image_size": f"{image.size[0]}x{image.size[1]}",
-                "image_mode": image.mode
-            }
-        )
+        # Decode + OCR + matching are CPU-bound; keep them off the event loop
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(OCR_EXECUTOR, _process_receipt_bytes, image_data)
+        return orjson_response(result.model_dump())
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error processing receipt: {str(e)}")
-        return JSONResponse(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content={
+        logger.error("Error processing receipt: %s", e)
+        return orjson_response(
+            {
                 "success": False,
                 "error": "Processing failed",
                 "message": str(e),
-                "timestamp": datetime.now().isoformat()
-            }
+                "timestamp": now_iso()
+            },
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
 @app.get("/api/v1/food-database", response_model=List[FoodDatabaseItem])
-async def get_food_database():
+async def get_food_database(request: Request):
     """
     Get the complete food database with shelf life information.
     Useful for frontend autocomplete, validation, or displaying available foods.
+    Supports conditional requests via ETag / If-None-Match.
     """
-    try:
-        # Build reverse mapping from food names to aliases
-        food_to_aliases = {}
-        for alias, food_name in FOOD_ITEMS.items():
-            if food_name not in food_to_aliases:
-                food_to_aliases[food_name] = []
-            food_to_aliases[food_name].append(alias)
-        
-        database_items = []
-        for food_name, shelf_life in SHELF_LIFE_DATA.items():
-            aliases = food_to_aliases.get(food_name, [])
-            category = categorize_food_item(food_name)
-            
-            database_item = FoodDatabaseItem(
-                name=food_name,
-                shelf_life=ShelfLifeInfo(**shelf_life),
-                aliases=aliases,
-                category=category
-            )
-            database_items.append(database_item)
-        
-        return database_items
-        
-    except Exception as e:
-        logger.error(f"Error retrieving food database: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to retrieve food database"
-        )
+    headers = {'ETag': FOOD_DATABASE_ETAG, 'Cache-Control': 'public, max-age=3600'}
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match and (if_none_match.strip() == '*' or FOOD_DATABASE_ETAG in [t.strip() for t in if_none_match.split(',')]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=FOOD_DATABASE_BODY, media_type="application/json", headers=headers)
 
 @app.get("/api/v1/food-database/{food_name}", response_model=FoodDatabaseItem)
 async def get_food_item(food_name: str):
@@ -583,21 +748,17 @@ async def get_food_item(food_name: str):
                 detail=f"Food item '{food_name}' not found in database"
             )
         
-        shelf_life = SHELF_LIFE_DATA[food_name]
-        aliases = [alias for alias, name in FOOD_ITEMS.items() if name == food_name]
-        category = categorize_food_item(food_name)
-        
-        return FoodDatabaseItem(
+        return FoodDatabaseItem.model_construct(
             name=food_name,
-            shelf_life=ShelfLifeInfo(**shelf_life),
-            aliases=aliases,
-            category=category
+            shelf_life=ShelfLifeInfo.model_construct(**SHELF_LIFE_DATA[food_name]),
+            aliases=FOOD_TO_ALIASES.get(food_name, []),
+            category=FOOD_CATEGORY[food_name]
         )
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error retrieving food item {food_name}: {str(e)}")
+        logger.error("Error retrieving food item %s: %s", food_name, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to retrieve food item"
@@ -610,10 +771,7 @@ async def get_food_categories():
     Useful for frontend filtering and organization.
     """
     try:
-        categories = set()
-        for food_name in SHELF_LIFE_DATA.keys():
-            category = categorize_food_item(food_name)
-            categories.add(category)
+        categories = set(FOOD_CATEGORY.values())
         
         return {
             "categories": sorted(list(categories)),
@@ -621,7 +779,7 @@ async def get_food_categories():
         }
         
     except Exception as e:
-        logger.error(f"Error retrieving categories: {str(e)}")
+        logger.error("Error retrieving categories: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to retrieve categories"
@@ -635,4 +793,13 @@ async def process_receipt_legacy(file: UploadFile = File(...)):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Import string lets uvicorn spawn worker processes; each re-imports this
+    # module and so gets its own OCR executor and caches.
+    uvicorn.run(
+        "app.api_main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+    )
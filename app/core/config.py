@@ -6,9 +6,32 @@ class Settings:
         self.app_name = os.getenv("APP_NAME", "Grocery Receipt Shelf Life Service")
         self.version = os.getenv("VERSION", "1.0.0")
         self.ocr_engine = os.getenv("OCR_ENGINE", "PaddleOCR")
-        self.log_level = os.getenv("LOG_LEVEL", "INFO")
+        self.log_level = os.getenv("LOG_LEVEL", "WARNING")
         self.foodkeeper_data_path = os.getenv("FOODKEEPER_DATA_PATH", "app/data/foodkeeper.json")
         self.canonical_items_path = os.getenv("CANONICAL_ITEMS_PATH", "app/data/canonical_items.json")
+        # Directory of an int8 ONNX embedding model; empty keeps the PyTorch sentence-transformer
+        self.embedding_onnx_path = os.getenv("EMBEDDING_ONNX_PATH", "")
+        # Memory-mapped cache of the canonical item embeddings, shared by workers and
+        # reused across restarts; empty disables it
+        self.canonical_embs_path = os.getenv("CANONICAL_EMBS_PATH", ".cache/canonical_embs.npy")
+        # Concurrent requests' embedding lookups are batched: up to this many texts,
+        # waiting at most this many milliseconds for others to arrive (0 disables)
+        self.embedding_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+        self.embedding_batch_wait_ms = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", 5))
+        # Upper bound on concurrent decode + OCR + matching jobs run off the event loop
+        self.ocr_workers = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
+        # Uploads larger than this are rejected with 413 while streaming in
+        self.max_upload_bytes = int(os.getenv("MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+        # OCR text cached per image content hash so retried uploads skip Tesseract
+        self.ocr_cache_size = int(os.getenv("OCR_CACHE_SIZE", 512))
+        # Longest image edge handed to Tesseract; larger photos are downscaled first
+        self.ocr_max_dim = int(os.getenv("OCR_MAX_DIM", 1600))
+        # Grayscale cut-off for the 1-bit image handed to Tesseract; 0 keeps grayscale
+        # and "otsu" picks a cut-off per image
+        threshold = os.getenv("OCR_BINARIZE_THRESHOLD", "140").strip().lower()
+        self.ocr_binarize_threshold = None if threshold == "otsu" else int(threshold)
+        # Straighten skewed receipt photos (up to 5 degrees) before OCR
+        self.ocr_deskew = os.getenv("OCR_DESKEW", "0") == "1"
 
 
 settings = Settings()
\ No newline at end of file
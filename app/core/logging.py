@@ -1,10 +1,14 @@
-from logging import getLogger, StreamHandler, Formatter, INFO, DEBUG, ERROR, FileHandler, basicConfig
+from logging import getLogger, StreamHandler, Formatter, INFO, DEBUG, WARNING, ERROR, FileHandler, basicConfig
+from typing import Optional
+
+from app.core.config import settings
 
 _LOGGER_NAME = "grocery_receipt_service"
 
-def setup_logging(level: str = "INFO") -> None:
+def setup_logging(level: Optional[str] = None) -> None:
 	"""Configure application logging.
 
+	Defaults to ``settings.log_level`` (WARNING unless LOG_LEVEL says otherwise).
 	Safe to call multiple times; handlers won't be duplicated.
 	"""
 	logger = getLogger(_LOGGER_NAME)
@@ -12,7 +16,8 @@ def setup_logging(level: str = "INFO") -> None:
 		# Already configured
 		return
 
-	numeric_level = INFO if level.upper() == "INFO" else DEBUG if level.upper() == "DEBUG" else ERROR
+	level = (level or settings.log_level).upper()
+	numeric_level = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING}.get(level, ERROR)
 	logger.setLevel(numeric_level)
 
 	console_handler = StreamHandler()
@@ -1,9 +1,21 @@
+import asyncio
 import logging
+import os
+import ahocorasick
 import pytesseract
+import re
+from types import MappingProxyType
 from PIL import Image
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.responses import JSONResponse
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import BinaryIO, List
+
+from app.core.config import settings
+from app.utils.image_preprocessing import find_text_lines, prepare_for_ocr
+from app.utils.responses import OrjsonResponse
+from app.utils.tesseract import image_to_string, images_to_strings, lines_to_string
 
 # Enhanced shelf life database based on USDA FoodKeeper data
 SHELF_LIFE_DATA = {
@@ -483,46 +495,147 @@ FOOD_ITEMS = {
     'great value': 'Great Value Brand'
 }
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+# Alias -> the (food_name, shelf_life) pair match_food_item returns, joined once
+# so a hit is a single lookup. Brand-only aliases carry no shelf life data.
+FOOD_LOOKUP = MappingProxyType({
+    alias: (food_name, SHELF_LIFE_DATA.get(food_name, {}))
+    for alias, food_name in FOOD_ITEMS.items()
+})
+
+# Returned for any line that matches no alias
+GENERIC_SHELF_LIFE = {
+    'pantry': 'Check packaging',
+    'fridge': 'Follow use-by date',
+    'freezer': 'Generally 3-6 months'
+}
+
+# Every word of every alias, mapped to the first alias (in FOOD_ITEMS order) that
+# contains it: a line matches the earliest alias with any word inside the line,
+# found in one scan instead of a substring test per alias and word
+FOOD_AUTOMATON = ahocorasick.Automaton()
+for _rank, (_alias, _result) in enumerate(FOOD_LOOKUP.items()):
+    for _word in _alias.split():
+        if _word not in FOOD_AUTOMATON:
+            FOOD_AUTOMATON.add_word(_word, (_rank, _result))
+FOOD_AUTOMATON.make_automaton()
+
+# Any of the peanut butter abbreviations, checked in one pass for GV lines
+PEANUT_BUTTER_RE = re.compile(r'pnt|peanut|buttr|butter')
+
+# Tesseract settings shared by every request: LSTM engine, single text block,
+# character whitelist restricted to what appears on receipts
+OCR_CONFIG = r'--oem 3 --psm 6 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789.,/$%#- '
+# Same settings for one pre-cropped receipt row: no layout analysis per line
+OCR_LINE_CONFIG = OCR_CONFIG.replace('--psm 6', '--psm 7')
+
+# Receipt lines containing any of these are prices, totals or store info
+SKIP_PATTERNS = [
+    'total', 'subtotal', 'tax', 'walmart', 'store', 'thank you', 
+    'receipt', 'cashier', 'card', 'cash', 'change', 'balance',
+    'member', 'save', '$'
+]
+
+# Store, operator, terminal and transaction codes (ST# 02345 OP# 009876 TE# 09
+# TR# 01234); the '#' is optional since OCR often drops or splits it
+STORE_CODE_PATTERN = r'\b(?:st|op|te|tr|tc)\s*#?\s*\d'
+
+# One case-insensitive alternation scans a line once instead of once per pattern
+SKIP_RE = re.compile('|'.join([*map(re.escape, SKIP_PATTERNS), STORE_CODE_PATTERN]), re.IGNORECASE)
+
+# Honor an explicit tesseract binary path once at startup
+if os.getenv('TESSERACT_CMD'):
+    pytesseract.pytesseract.tesseract_cmd = os.getenv('TESSERACT_CMD')
+
+# Setup logging (WARNING by default; set LOG_LEVEL=INFO/DEBUG for request traces)
+logging.basicConfig(level=getattr(logging, settings.log_level.upper(), logging.WARNING))
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Enhanced Grocery OCR & Shelf Life Service", version="2.0")
+app = FastAPI(title="Enhanced Grocery OCR & Shelf Life Service", version="2.0", default_response_class=OrjsonResponse)
+
+# Image decode + OCR block for seconds; run them here instead of on the event loop
+OCR_EXECUTOR = ThreadPoolExecutor(max_workers=settings.ocr_workers, thread_name_prefix="ocr")
 
+@lru_cache(maxsize=4096)
 def match_food_item(ocr_text: str) -> tuple[str, dict]:
     """
     Enhanced matching for food items with better handling of store brands and variations.
-    Returns tuple of (food_name, shelf_life_dict)
+    Returns tuple of (food_name, shelf_life_dict). Memoized, since the same lines
+    repeat across receipts; callers must not mutate the returned dict.
     """
     text_lower = ocr_text.lower().strip()
     
     # Handle specific Great Value peanut butter case
-    if 'gv' in text_lower and any(word in text_lower for word in ['pnt', 'peanut', 'buttr', 'butter']):
+    if 'gv' in text_lower and PEANUT_BUTTER_RE.search(text_lower):
         return 'Peanut Butter', SHELF_LIFE_DATA['Peanut Butter']
     
     # Try exact match first
-    if text_lower in FOOD_ITEMS:
-        food_name = FOOD_ITEMS[text_lower]
-        return food_name, SHELF_LIFE_DATA.get(food_name, {})
+    hit = FOOD_LOOKUP.get(text_lower)
+    if hit is not None:
+        return hit
     
     # Try partial matching for complex items
-    for key, food_name in FOOD_ITEMS.items():
-        if key in text_lower or any(word in text_lower for word in key.split()):
-            return food_name, SHELF_LIFE_DATA.get(food_name, {})
+    hit = min((value for _, value in FOOD_AUTOMATON.iter(text_lower)), default=None)
+    if hit is not None:
+        return hit[1]
     
     # Fallback to generic shelf life
-    generic_shelf_life = {
-        'pantry': 'Check packaging',
-        'fridge': 'Follow use-by date',
-        'freezer': 'Generally 3-6 months'
-    }
-    return ocr_text, generic_shelf_life
+    return ocr_text, GENERIC_SHELF_LIFE
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "Enhanced Grocery OCR & Shelf Life Service"}
 
+def extract_food_items(raw_text: str) -> List[dict]:
+    """Match each OCR'd receipt line against the food database"""
+    # Process text into lines and extract potential food items
+    food_items = []
+    
+    for line in raw_text.split('\n'):
+        line = line.strip()
+        
+        # Skip blank or very short lines first (cheap), then lines that are
+        # clearly prices, totals, or store info (one regex pass)
+        if len(line) < 3 or SKIP_RE.search(line):
+            continue
+        
+        # Try to match food items
+        food_name, shelf_life = match_food_item(line)
+        
+        # Only add if we have shelf life data (indicating a successful match)
+        if shelf_life:
+            food_items.append({
+                "raw_text": line,
+                "food_name": food_name,
+                "shelf_life": shelf_life
+            })
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Matched: %r -> %r", line, food_name)
+    
+    return food_items
+
+def _load_image(fp: BinaryIO) -> Image.Image:
+    # Decode straight from the upload's spooled temp file; no bytes copy
+    image = Image.open(fp)
+    
+    logger.info("Image loaded: %s pixels, mode: %s", image.size, image.mode)
+    
+    # Grayscale + downscale + binarize: OCR cost scales with pixel count
+    return prepare_for_ocr(image, settings.ocr_max_dim, settings.ocr_binarize_threshold, settings.ocr_deskew)
+
+def _ocr_file(fp: BinaryIO) -> str:
+    """Decode an uploaded image and OCR it row by row. Runs inside OCR_EXECUTOR."""
+    image = _load_image(fp)
+    boxes = find_text_lines(image)
+    # Too few rows means the layout wasn't a plain receipt; let Tesseract segment it
+    if len(boxes) < 3:
+        return image_to_string(image, config=OCR_CONFIG)
+    return lines_to_string(image, boxes, config=OCR_LINE_CONFIG)
+
+def _ocr_batch_files(fps: List[BinaryIO]) -> List[str]:
+    """Decode several uploads and OCR them in one Tesseract run. Runs inside OCR_EXECUTOR."""
+    return images_to_strings([_load_image(fp) for fp in fps], config=OCR_CONFIG)
+
 @app.post("/ocr")
 async def process_receipt(file: UploadFile = File(...)):
     """
@@ -533,55 +646,19 @@ async def process_receipt(file: UploadFile = File(...)):
         if not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        logger.info(f"Processing image: {file.filename}, type: {file.content_type}")
-        
-        # Read and process image
-        image_data = await file.read()
-        image = Image.open(io.BytesIO(image_data))
-        
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        logger.info(f"Image loaded: {image.size} pixels, mode: {image.mode}")
+        logger.info("Processing image: %s, type: %s", file.filename, file.content_type)
         
         # Perform OCR with enhanced settings
-        custom_config = r'--oem 3 --psm 6 -c tesseract_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789.,/$%- '
-        raw_text = pytesseract.image_to_string(image, config=custom_config)
-        
-        logger.info(f"Raw OCR text length: {len(raw_text)} characters")
-        logger.info(f"Raw OCR text preview: {raw_text[:200]}...")
+        loop = asyncio.get_running_loop()
+        raw_text = await loop.run_in_executor(OCR_EXECUTOR, _ocr_file, file.file)
         
-        # Process text into lines and extract potential food items
-        lines = [line.strip() for line in raw_text.split('\n') if line.strip()]
-        food_items = []
+        logger.info("Raw OCR text length: %d characters", len(raw_text))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Raw OCR text preview: %s...", raw_text[:200])
         
-        for line in lines:
-            # Skip lines that are clearly prices, totals, or store info
-            if any(skip_word in line.lower() for skip_word in [
-                'total', 'subtotal', 'tax', 'walmart', 'store', 'thank you', 
-                'receipt', 'cashier', 'card', 'cash', 'change', 'balance',
-                'member', 'save', '$', 'tc#', 'st#', 'op#', 'te#'
-            ]):
-                continue
-            
-            # Skip very short lines or lines that are clearly not food items
-            if len(line) < 3:
-                continue
-            
-            # Try to match food items
-            food_name, shelf_life = match_food_item(line)
-            
-            # Only add if we have shelf life data (indicating a successful match)
-            if shelf_life and shelf_life != {}:
-                food_items.append({
-                    "raw_text": line,
-                    "food_name": food_name,
-                    "shelf_life": shelf_life
-                })
-                logger.info(f"Matched: '{line}' -> '{food_name}'")
+        food_items = extract_food_items(raw_text)
         
-        logger.info(f"Total matched food items: {len(food_items)}")
+        logger.info("Total matched food items: %d", len(food_items))
         
         return {
             "success": True,
@@ -592,15 +669,59 @@ async def process_receipt(file: UploadFile = File(...)):
         }
         
     except Exception as e:
-        logger.error(f"Error processing receipt: {str(e)}")
+        logger.error("Error processing receipt: %s", e)
         return JSONResponse(
             status_code=500,
             content={"success": False, "error": str(e)}
         )
 
-# Add missing import
-import io
+@app.post("/ocr/batch")
+async def process_receipts_batch(files: List[UploadFile] = File(...)):
+    """
+    Process several receipt images at once, loading the OCR engine a single time
+    """
+    for file in files:
+        if not file.content_type or not file.content_type.startswith('image/'):
+            raise HTTPException(status_code=400, detail=f"File must be an image: {file.filename}")
+    
+    try:
+        logger.info("Processing batch of %d images", len(files))
+        
+        loop = asyncio.get_running_loop()
+        raw_texts = await loop.run_in_executor(OCR_EXECUTOR, _ocr_batch_files, [file.file for file in files])
+        
+        receipts = []
+        for file, raw_text in zip(files, raw_texts):
+            food_items = extract_food_items(raw_text)
+            receipts.append({
+                "filename": file.filename,
+                "items_found": len(food_items),
+                "items": food_items,
+                "raw_text_preview": raw_text[:500]
+            })
+        
+        return {
+            "success": True,
+            "receipts_processed": len(receipts),
+            "receipts": receipts,
+            "service_info": "Enhanced OCR with USDA FoodKeeper data"
+        }
+        
+    except Exception as e:
+        logger.error("Error processing receipt batch: %s", e)
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "error": str(e)}
+        )
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Same serving setup as api_main: import string so uvicorn can spawn workers
+    uvicorn.run(
+        "app.enhanced_main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+    )
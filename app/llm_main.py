@@ -7,14 +7,22 @@ from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import BinaryIO, List, Dict, Any, Optional
+import importlib.util
 import logging
 from PIL import Image
-import io
-import json
+from functools import lru_cache
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
-from app.services.llm_ocr_service import process_receipt_with_llm
+from app.core.config import settings
+from app.utils.responses import OrjsonResponse
+from app.services.llm_ocr_service import load_food_database, process_receipt_with_llm, process_receipts_with_llm
+
+# Configure logging once at import (WARNING by default; set LOG_LEVEL=INFO/DEBUG for request traces)
+logging.basicConfig(level=getattr(logging, settings.log_level.upper(), logging.WARNING))
+logger = logging.getLogger(__name__)
 
 # Enhanced Pydantic models
 class ProcessedItem(BaseModel):
@@ -35,6 +43,14 @@ class ReceiptProcessResponse(BaseModel):
     message: str
     error: Optional[str] = None
 
+class BatchReceiptResult(ReceiptProcessResponse):
+    filename: Optional[str] = None
+
+class BatchProcessResponse(BaseModel):
+    success: bool
+    receipts_processed: int
+    receipts: List[BatchReceiptResult]
+
 class HealthResponse(BaseModel):
     status: str
     version: str
@@ -47,7 +63,8 @@ app = FastAPI(
     description="AI-powered grocery receipt processing with intelligent item extraction using Large Language Models",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=OrjsonResponse
 )
 
 # Configure CORS
@@ -59,9 +76,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+# Probed once at startup: find_spec checks for transformers without importing it
+HAS_TRANSFORMERS = importlib.util.find_spec('transformers') is not None
+HAS_OPENAI_KEY = bool(os.getenv('OPENAI_API_KEY'))
 
 @app.get("/api/v1/health", response_model=HealthResponse)
 async def health_check():
@@ -69,14 +86,12 @@ async def health_check():
     
     # Check LLM availability
     llm_status = "disabled"
-    if os.getenv('OPENAI_API_KEY'):
+    if HAS_OPENAI_KEY:
         llm_status = "openai_available"
+    elif HAS_TRANSFORMERS:
+        llm_status = "local_model_available"
     else:
-        try:
-            from transformers import pipeline
-            llm_status = "local_model_available"
-        except ImportError:
-            llm_status = "rule_based_only"
+        llm_status = "rule_based_only"
     
     features = [
         "OCR with Tesseract",
@@ -98,6 +113,19 @@ async def health_check():
         llm_status=llm_status
     )
 
+# OCR and LLM parsing block (CPU or network); run them here instead of on the event loop
+OCR_EXECUTOR = ThreadPoolExecutor(max_workers=settings.ocr_workers, thread_name_prefix="ocr")
+
+def _process_image_file(fp: BinaryIO) -> Dict[str, Any]:
+    """Decode an uploaded image and run the LLM receipt pipeline. Runs inside OCR_EXECUTOR."""
+    # Decode straight from the upload's spooled temp file; no bytes copy
+    image = Image.open(fp)
+    
+    logger.info(f"Image processed: {image.size} pixels, mode: {image.mode}")
+    
+    # Left undecoded: OCRService downscales, deskews and binarizes for its engine
+    return process_receipt_with_llm(image)
+
 @app.post("/api/v1/receipt/process", response_model=ReceiptProcessResponse)
 async def process_receipt(file: UploadFile = File(...)):
     """
@@ -117,17 +145,9 @@ async def process_receipt(file: UploadFile = File(...)):
     try:
         logger.info(f"Processing receipt: {file.filename}, type: {file.content_type}")
         
-        # Read and process image
-        image_data = await file.read()
-        image = Image.open(io.BytesIO(image_data))
-        
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        logger.info(f"Image processed: {image.size} pixels, mode: {image.mode}")
-        
         # Process with LLM-enhanced service
-        result = process_receipt_with_llm(image)
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(OCR_EXECUTOR, _process_image_file, file.file)
         
         if result['success']:
             logger.info(f"Successfully processed {result['total_items']} items using {result['parsing_method']}")
@@ -140,12 +160,49 @@ async def process_receipt(file: UploadFile = File(...)):
         logger.error(f"Receipt processing error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to process receipt: {str(e)}")
 
+def _process_image_files(fps: List[BinaryIO]) -> List[Dict[str, Any]]:
+    """Decode several uploads and run them through the LLM pipeline together. Runs inside OCR_EXECUTOR."""
+    images = [Image.open(fp) for fp in fps]
+    return process_receipts_with_llm(images)
+
+@app.post("/api/v1/receipt/process-batch", response_model=BatchProcessResponse)
+async def process_receipts_batch(files: List[UploadFile] = File(...)):
+    """
+    Process several receipt images in one request. OCR runs as a single batch
+    and, with OpenAI, the receipts are parsed concurrently.
+    """
+    for file in files:
+        if not file.content_type or not file.content_type.startswith('image/'):
+            raise HTTPException(status_code=400, detail=f"File must be an image: {file.filename}")
+    
+    try:
+        logger.info(f"Processing batch of {len(files)} receipts")
+        
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(OCR_EXECUTOR, _process_image_files, [file.file for file in files])
+        
+        failed = next((result for result in results if not result['success']), None)
+        if failed is not None:
+            logger.error(f"Batch processing failed: {failed.get('error', 'Unknown error')}")
+            raise HTTPException(status_code=500, detail=failed.get('message', 'Processing failed'))
+        
+        return BatchProcessResponse(
+            success=True,
+            receipts_processed=len(results),
+            receipts=[BatchReceiptResult(filename=file.filename, **result) for file, result in zip(files, results)]
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch receipt processing error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to process receipts: {str(e)}")
+
 @app.get("/api/v1/food-database")
 async def get_food_database():
     """Get the complete USDA FoodKeeper database"""
     try:
-        with open('/app/data/enhanced_food_database.json', 'r') as f:
-            database = json.load(f)
+        database = load_food_database()
         return {
             "success": True,
             "total_items": len(database),
@@ -154,20 +211,28 @@ async def get_food_database():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to load food database: {str(e)}")
 
+@lru_cache(maxsize=1024)
+def _find_food_item(query: str) -> Optional[Dict[str, Any]]:
+    """First database item whose lowercased name contains, or is contained in, query"""
+    for name, item in _food_names_lower():
+        if query in name or name in query:
+            return item
+    return None
+
+@lru_cache(maxsize=1)
+def _food_names_lower() -> List[tuple]:
+    return [(item['name'].lower(), item) for item in load_food_database()]
+
 @app.get("/api/v1/food-database/{item_name}")
 async def get_food_item(item_name: str):
     """Get specific food item information"""
     try:
-        with open('/app/data/enhanced_food_database.json', 'r') as f:
-            database = json.load(f)
-        
-        # Search for item
-        for item in database:
-            if item_name.lower() in item['name'].lower() or item['name'].lower() in item_name.lower():
-                return {
-                    "success": True,
-                    "item": item
-                }
+        item = _find_food_item(item_name.lower())
+        if item is not None:
+            return {
+                "success": True,
+                "item": item
+            }
         
         return {
             "success": False,
@@ -201,13 +266,13 @@ async def get_parsing_methods():
     """Get available parsing methods and their status"""
     methods = {
         "openai": {
-            "available": bool(os.getenv('OPENAI_API_KEY')),
+            "available": HAS_OPENAI_KEY,
             "description": "OpenAI GPT-powered intelligent parsing",
             "accuracy": "Highest",
             "cost": "Per API call"
         },
         "local_llm": {
-            "available": False,  # Would need proper setup
+            "available": HAS_TRANSFORMERS,
             "description": "Local transformer model parsing", 
             "accuracy": "Medium-High",
             "cost": "Free (compute intensive)"
@@ -220,13 +285,6 @@ async def get_parsing_methods():
         }
     }
     
-    # Check transformers availability
-    try:
-        from transformers import pipeline
-        methods["local_llm"]["available"] = True
-    except ImportError:
-        pass
-    
     return {
         "success": True,
         "methods": methods
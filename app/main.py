@@ -2,12 +2,16 @@ from fastapi import FastAPI
 from app.api.v1.routes import router as api_router
 from app.core.logging import setup_logging
 from app.core.config import settings
+from app.utils.responses import OrjsonResponse
+from app.utils.uploads import reject_oversized_body
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Grocery Receipt Shelf Life Service")
+    app = FastAPI(title="Grocery Receipt Shelf Life Service", default_response_class=OrjsonResponse)
     
     setup_logging(settings.log_level)
     
+    app.middleware("http")(reject_oversized_body)
+    
     app.include_router(api_router, prefix="/api/v1")
     
     return app
@@ -1,33 +1,275 @@
 from __future__ import annotations
+from concurrent.futures import Future
 from typing import List, Tuple
+import contextlib
+import json
+import os
+import queue
+import threading
+import time
+import cachetools
 import numpy as np
 import torch
 from sentence_transformers import SentenceTransformer
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None  # type: ignore
+try:
+    from optimum.onnxruntime import ORTModelForFeatureExtraction  # type: ignore
+    from transformers import AutoTokenizer
+except Exception:  # pragma: no cover - optional dependency
+    ORTModelForFeatureExtraction = None  # type: ignore
+
+
+class OnnxSentenceEncoder:
+    """int8 ONNX Runtime export of a sentence-transformer (see scripts/export_onnx_embeddings.py).
+
+    Mirrors the part of SentenceTransformer.encode that EmbeddingService uses:
+    mean-pooled, optionally L2-normalized numpy embeddings.
+    """
+
+    def __init__(self, model_dir: str, file_name: str = "model_quantized.onnx") -> None:
+        if ORTModelForFeatureExtraction is None:
+            raise RuntimeError("optimum[onnxruntime] not installed; required for EMBEDDING_ONNX_PATH")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            model_dir, file_name=file_name, provider="CPUExecutionProvider"
+        )
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = True, **_: object) -> np.ndarray:
+        inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=512, return_tensors="np")
+        hidden = np.asarray(self.model(**inputs).last_hidden_state, dtype=np.float32)  # (M, T, D)
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        embs = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if normalize_embeddings:
+            embs /= np.maximum(np.linalg.norm(embs, axis=1, keepdims=True), 1e-12)
+        return embs
 
 
 class EmbeddingService:
-    def __init__(self, model_name: str = "intfloat/e5-small-v2", device: str | None = None) -> None:
+    def __init__(
+        self,
+        model_name: str = "intfloat/e5-small-v2",
+        device: str | None = None,
+        onnx_path: str | None = None,
+        cache_path: str | None = None,
+    ) -> None:
         if device is None:
             device = "cuda" if torch.cuda.is_available() else "cpu"
         self.device = device
-        self.model = SentenceTransformer(model_name, device=self.device)
+        if onnx_path:
+            # Quantized CPU model; same encode() interface as SentenceTransformer
+            self.device = "cpu"
+            self.model = OnnxSentenceEncoder(onnx_path)
+        else:
+            self.model = SentenceTransformer(model_name, device=self.device)
         self.canonical_names: List[str] = []
         self.canonical_embs: np.ndarray | None = None  # shape (N, D)
+        # Canonical embeddings persisted as a float32 .npy (plus a .json of the
+        # model and names they were built from). Restarts skip re-encoding, and
+        # uvicorn workers memory-map the same file so the table's pages are shared.
+        self.cache_path = cache_path
+        self._cache_key = onnx_path or model_name
+        # Receipt lines repeat across (and within) receipts; keep their query embeddings
+        self._query_cache: cachetools.LRUCache = cachetools.LRUCache(maxsize=4096)
+        self._query_cache_lock = threading.Lock()
+        # Per-thread score buffers reused across requests (executor threads share the service)
+        self._local = threading.local()
 
     def _encode(self, texts: List[str]) -> np.ndarray:
         # E5 models expect "query: ..." for queries and "passage: ..." for docs; for simplicity use raw texts
-        embs = self.model.encode(texts, normalize_embeddings=True, convert_to_numpy=True, device=self.device)
+        # Receipt batches and the canonical table go through in 64-text forward passes
+        embs = self.model.encode(
+            texts, batch_size=64, normalize_embeddings=True, convert_to_numpy=True, device=self.device
+        )
         return embs.astype(np.float32)
 
     def load_canonical(self, names: List[str]) -> None:
         self.canonical_names = list(dict.fromkeys(names))  # dedupe preserving order
-        self.canonical_embs = self._encode(self.canonical_names)
+        # Workers booting together queue on the lock: the first encodes and
+        # writes the cache, the rest map what it wrote
+        with self._canonical_cache_lock():
+            embs = self._load_cached_canonical()
+            if embs is None:
+                embs = self._encode(self.canonical_names)
+                self._save_cached_canonical(embs)
+                cached = self._load_cached_canonical()
+                if cached is not None:
+                    embs = cached
+        # C-contiguous float32 keeps the scoring matmul on the BLAS SGEMV fast path;
+        # a float32 memmap already is, so this stays a zero-copy view of the file
+        self.canonical_embs = np.ascontiguousarray(embs, dtype=np.float32)
+
+    @contextlib.contextmanager
+    def _canonical_cache_lock(self):
+        if not self.cache_path or fcntl is None:
+            yield
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            lock_file = open(self.cache_path + ".lock", "w")
+        except OSError:
+            yield
+            return
+        with lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_cached_canonical(self) -> np.ndarray | None:
+        if not self.cache_path:
+            return None
+        try:
+            with open(self.cache_path + ".json") as f:
+                meta = json.load(f)
+            if meta.get("model") != self._cache_key or meta.get("names") != self.canonical_names:
+                return None
+            embs = np.load(self.cache_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if embs.dtype != np.float32 or embs.shape[0] != len(self.canonical_names):
+            return None
+        return embs
+
+    def _save_cached_canonical(self, embs: np.ndarray) -> None:
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            # Write then rename so concurrently starting workers never read a partial file
+            tmp = f"{self.cache_path}.{os.getpid()}.tmp.npy"
+            np.save(tmp, np.ascontiguousarray(embs, dtype=np.float32))
+            os.replace(tmp, self.cache_path)
+            with open(tmp + ".json", "w") as f:
+                json.dump({"model": self._cache_key, "names": self.canonical_names}, f)
+            os.replace(tmp + ".json", self.cache_path + ".json")
+        except OSError:
+            pass
+
+    def _encode_queries(self, texts: List[str]) -> np.ndarray:
+        # Encode only the texts not seen before, all in one model call
+        with self._query_cache_lock:
+            cached = {t: self._query_cache.get(t) for t in texts}
+        missing = [t for t in dict.fromkeys(texts) if cached[t] is None]
+        if missing:
+            for t, emb in zip(missing, self._encode(missing)):
+                cached[t] = emb
+            with self._query_cache_lock:
+                for t in missing:
+                    self._query_cache[t] = cached[t]
+        return np.stack([cached[t] for t in texts])  # shape (M, D)
+
+    def _score_buffer(self, rows: int) -> np.ndarray:
+        n = len(self.canonical_names)
+        buf = getattr(self._local, "scores", None)
+        if buf is None or buf.shape[0] < rows or buf.shape[1] != n:
+            buf = self._local.scores = np.empty((rows, n), dtype=np.float32)
+        return buf[:rows]
 
     def top_k(self, text: str, k: int = 3) -> List[Tuple[str, float]]:
+        return self.top_k_batch([text], k)[0]
+
+    def top_k_batch(self, texts: List[str], k: int = 3) -> List[List[Tuple[str, float]]]:
         if self.canonical_embs is None or not self.canonical_names:
+            return [[] for _ in texts]
+        k = min(k, len(self.canonical_names))
+        if k <= 0 or not texts:
+            return [[] for _ in texts]
+        q = self._encode_queries(texts)
+        # cosine since already normalized; written into a reused (M, N) buffer
+        scores = self._score_buffer(len(texts))
+        if len(texts) == 1:
+            # Single query: plain SGEMV, no (1, N) matrix product
+            np.dot(self.canonical_embs, q[0], out=scores[0])
+        else:
+            # One (M, D) @ (D, N) matmul for every query
+            np.matmul(q, self.canonical_embs.T, out=scores)
+        # O(N) selection of each row's k best, then sort only those k
+        idxs = np.argpartition(scores, -k, axis=1)[:, -k:]
+        top = np.take_along_axis(scores, idxs, axis=1)
+        idxs = np.take_along_axis(idxs, np.argsort(-top, axis=1), axis=1)
+        return [
+            [(self.canonical_names[i], float(row_scores[i])) for i in row_idxs]
+            for row_idxs, row_scores in zip(idxs, scores)
+        ]
+
+
+class BatchingEmbedder:
+    """Coalesces top_k_batch calls from concurrent requests into one encode + matmul.
+
+    Request threads enqueue their texts and block on a future; a single worker
+    thread scores a lone request straight away, and when others are already
+    queued behind it gathers requests for up to max_wait_time seconds (or until
+    max_batch_size texts), scores them with one EmbeddingService.top_k_batch
+    call and hands each caller its own rows. Exposes the parts of the
+    EmbeddingService interface MatchingService uses, so it can stand in for it.
+    """
+
+    def __init__(self, service: EmbeddingService, max_batch_size: int = 32, max_wait_time: float = 0.005) -> None:
+        self.service = service
+        self.max_batch_size = max_batch_size
+        self.max_wait_time = max_wait_time
+        self._queue: queue.Queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    @property
+    def canonical_names(self) -> List[str]:
+        return self.service.canonical_names
+
+    @property
+    def canonical_embs(self) -> np.ndarray | None:
+        return self.service.canonical_embs
+
+    def load_canonical(self, names: List[str]) -> None:
+        self.service.load_canonical(names)
+
+    def top_k(self, text: str, k: int = 3) -> List[Tuple[str, float]]:
+        return self.top_k_batch([text], k)[0]
+
+    def top_k_batch(self, texts: List[str], k: int = 3) -> List[List[Tuple[str, float]]]:
+        if not texts:
             return []
-        q = self._encode([text])  # shape (1, D)
-        # cosine since already normalized
-        scores = (self.canonical_embs @ q.T).squeeze(-1)  # shape (N,)
-        idxs = np.argsort(-scores)[:k]
-        return [(self.canonical_names[i], float(scores[i])) for i in idxs]
\ No newline at end of file
+        fut: Future = Future()
+        self._queue.put((list(texts), k, fut))
+        return fut.result()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait_time
+        while size < self.max_batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                # Nothing else waiting: don't hold a lone request for stragglers
+                timeout = deadline - time.monotonic()
+                if len(batch) == 1 or timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            texts = [t for item_texts, _, _ in batch for t in item_texts]
+            # Score once with the largest k asked for; rows come back best-first,
+            # so each caller's top k is a prefix of its rows
+            try:
+                tops = self.service.top_k_batch(texts, max(k for _, k, _ in batch))
+            except Exception as e:
+                for _, _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            start = 0
+            for item_texts, k, fut in batch:
+                fut.set_result([top[:k] for top in tops[start:start + len(item_texts)]])
+                start += len(item_texts)
\ No newline at end of file
@@ -4,26 +4,227 @@ Uses OpenAI GPT or local LLM to intelligently parse and categorize receipt items
 """
 
 import os
+import importlib.util
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from PIL import Image
-import pytesseract
-import json
+import ahocorasick
+import asyncio
+import bisect
+import orjson
 import re
-from dataclasses import dataclass
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
 
-# Optional LLM integrations
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+from app.core.config import settings
+from app.services.ocr_service import OCRService
 
-try:
-    from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    TRANSFORMERS_AVAILABLE = False
+# Optional LLM integrations: probed here, imported only by the code that uses them,
+# so importing this module doesn't pay for loading openai or transformers
+OPENAI_AVAILABLE = importlib.util.find_spec('openai') is not None
+TRANSFORMERS_AVAILABLE = importlib.util.find_spec('transformers') is not None
+
+FOOD_DATABASE_PATH = '/app/data/enhanced_food_database.json'
+
+OPENAI_MODEL = "gpt-3.5-turbo"
+# Concurrent chat completions in flight for parse_with_openai_async
+OPENAI_MAX_CONCURRENCY = 10
+OPENAI_MAX_RETRIES = 3
+
+# Instructions shared by every receipt; only the lines are filled in per request
+OPENAI_PROMPT_TEMPLATE = """Analyze this grocery receipt text and extract only actual food/grocery items.
+Ignore store info, addresses, payment details, staff names, etc.
+
+Receipt lines:
+{lines}
+
+For each actual grocery item found, provide:
+- raw_text: exact text from receipt
+- normalized_name: clean product name
+- confidence: 0.0-1.0 how confident this is a food item
+- category: food category (dairy, produce, meat, etc.)
+- price: if extractable from line
+- brand: if identifiable
+
+Return a JSON object whose "items" key holds the array of items.
+Only include actual grocery products, not store metadata.
+"""
+
+@lru_cache(maxsize=1)
+def load_food_database() -> List[Dict[str, Any]]:
+    """USDA food database, read and parsed once per process. Treat as read-only."""
+    with open(FOOD_DATABASE_PATH, 'rb') as f:
+        return orjson.loads(f.read())
+
+# Substrings that mark a receipt line as a grocery item
+FOOD_KEYWORDS = (
+    'BREAD', 'MILK', 'EGGS', 'BUTTER', 'CHEESE', 'MEAT', 'CHICKEN', 'BEEF',
+    'PORK', 'FISH', 'FRUIT', 'BANANA', 'APPLE', 'ORANGE', 'VEGETABLE',
+    'TOMATO', 'ONION', 'POTATO', 'RICE', 'PASTA', 'CEREAL', 'COFFEE',
+    'TEA', 'JUICE', 'SODA', 'YOGURT', 'CREAM', 'BAGEL', 'MUFFIN',
+    'PIZZA', 'SANDWICH', 'SOUP', 'SAUCE', 'OIL', 'SUGAR', 'FLOUR',
+    'SALT', 'PEPPER', 'SPICE', 'CONDIMENT', 'PEANUT', 'NUT', 'COOKIE',
+    'CAKE', 'ICE CREAM', 'FROZEN', 'CANNED', 'ORGANIC', 'FRESH'
+)
+
+# Store brands, in order of precedence
+BRAND_MARKERS = (('GV ', 'Great Value'), ('KROGER', 'Kroger'), ('FOLGERS', 'Folgers'))
+
+# Categories in order of precedence with the substrings that select them
+CATEGORY_KEYWORDS = (
+    ('Bakery', ('BREAD', 'BAGEL', 'MUFFIN', 'ROLL')),
+    ('Dairy', ('MILK', 'CHEESE', 'BUTTER', 'YOGURT', 'CREAM')),
+    ('Meat & Seafood', ('CHICKEN', 'BEEF', 'PORK', 'FISH', 'MEAT')),
+    ('Produce', ('FRUIT', 'VEGETABLE', 'BANANA', 'APPLE', 'TOMATO')),
+    ('Frozen', ('FROZEN', 'ICE CREAM')),
+    ('Beverages', ('COFFEE', 'TEA', 'JUICE', 'SODA')),
+    ('Pantry', ('PEANUT', 'NUT', 'BUTTER')),
+)
+
+# One automaton pass per line finds every food keyword and brand marker:
+# values are (food keyword or None, brand precedence or None)
+LINE_AUTOMATON = ahocorasick.Automaton()
+for keyword in FOOD_KEYWORDS:
+    LINE_AUTOMATON.add_word(keyword, (keyword, None))
+for rank, (marker, _) in enumerate(BRAND_MARKERS):
+    LINE_AUTOMATON.add_word(marker, (None, rank))
+LINE_AUTOMATON.make_automaton()
+
+# Category keyword -> precedence of the first category listing it
+CATEGORY_AUTOMATON = ahocorasick.Automaton()
+for rank, (_, words) in enumerate(CATEGORY_KEYWORDS):
+    for word in words:
+        if not CATEGORY_AUTOMATON.exists(word):
+            CATEGORY_AUTOMATON.add_word(word, rank)
+CATEGORY_AUTOMATON.make_automaton()
+
+PRICE_RE = re.compile(r'(\d+\.\d{2})')
+
+@dataclass(frozen=True)
+class FoodNameIndex:
+    """Lookup structures over the lowercased food database names"""
+    automaton: ahocorasick.Automaton  # name -> first index, for names inside an item
+    joined: str  # names joined by newlines, for items inside a name
+    starts: List[int]  # offset of each name in joined
+    token_index: Dict[str, List[int]]  # name token -> indices of names containing it
+
+    def best_match(self, item_lower: str) -> Optional[int]:
+        """Index of the first name contained in (or containing) item_lower,
+        else of the first name sharing the most tokens with it"""
+        hits = [i for _, i in self.automaton.iter(item_lower)] if len(self.automaton) else []
+        if '\n' not in item_lower:
+            pos = self.joined.find(item_lower)
+            if pos >= 0:
+                hits.append(bisect.bisect_right(self.starts, pos) - 1)
+        if hits:
+            return min(hits)
+        
+        scores = Counter()
+        for token in set(item_lower.split()):
+            for i in self.token_index.get(token, ()):
+                scores[i] += 1
+        if not scores:
+            return None
+        return min(scores, key=lambda i: (-scores[i], i))
+
+@lru_cache(maxsize=1)
+def load_food_name_index() -> FoodNameIndex:
+    """Index over load_food_database() names, built once per process"""
+    names = [food_item['name'].lower() for food_item in load_food_database()]
+    automaton = ahocorasick.Automaton()
+    token_index = defaultdict(list)
+    starts = []
+    offset = 0
+    for i, name in enumerate(names):
+        if name and not automaton.exists(name):
+            automaton.add_word(name, i)
+        for token in set(name.split()):
+            token_index[token].append(i)
+        starts.append(offset)
+        offset += len(name) + 1
+    if len(automaton):
+        automaton.make_automaton()
+    return FoodNameIndex(automaton, '\n'.join(names), starts, dict(token_index))
+
+@lru_cache(maxsize=4096)
+def best_food_match_index(item_lower: str) -> Optional[int]:
+    """Memoized FoodNameIndex.best_match over the process-wide index"""
+    return load_food_name_index().best_match(item_lower)
+
+# Receipt abbreviations expanded in normalized names
+ABBREVIATIONS = {
+    'GV': 'Great Value',
+    'PNT BUTTR': 'Peanut Butter',
+    'CHNK CHKN': 'Chunk Chicken',
+    'PARM': 'Parmesan',
+    'WHL MLK': 'Whole Milk',
+    'ORG': 'Organic',
+}
+ABBREVIATION_RE = re.compile(r'\b(' + '|'.join(map(re.escape, ABBREVIATIONS)) + r')\b')
+RECEIPT_NOISE_RE = re.compile(r'\d{10,}|[FNX]\s*\d+\.\d{2}|(?:ST|OP|TE|TR)#.*')
+
+@lru_cache(maxsize=4096)
+def normalize_product_name(raw_text: str) -> str:
+    """Clean and normalize product names. Memoized: receipts from the same
+    store repeat most of their lines."""
+    # Remove SKU/barcode numbers, price columns with tax flags and transaction codes
+    text = RECEIPT_NOISE_RE.sub('', raw_text)
+    
+    # Expand common abbreviations in one pass over the text
+    text = ABBREVIATION_RE.sub(lambda m: ABBREVIATIONS[m.group(1)], text)
+    
+    # Remove extra whitespace and clean
+    text = ' '.join(text.split())
+    text = text.strip()
+    
+    return text
+
+@lru_cache(maxsize=4096)
+def categorize_item(item_name: str) -> str:
+    """Category of the first CATEGORY_KEYWORDS entry with a keyword in item_name"""
+    ranks = [rank for _, rank in CATEGORY_AUTOMATON.iter(item_name.upper())]
+    return CATEGORY_KEYWORDS[min(ranks)][0] if ranks else 'Grocery'
+
+@lru_cache(maxsize=4096)
+def analyze_line(line: str) -> Optional[Tuple[str, float, str, Optional[float], Optional[str]]]:
+    """(normalized name, confidence, category, price, brand) for a food line, else None.
+    Memoized on the line: the rule-based parser's per-line work, reused across receipts."""
+    # Extract price if present
+    price_match = PRICE_RE.search(line)
+    price = float(price_match.group(1)) if price_match else None
+    
+    # Food keywords and store brand in a single pass over the line
+    line_upper = line.upper()
+    keywords = set()
+    brand_rank = None
+    for _, (keyword, rank) in LINE_AUTOMATON.iter(line_upper):
+        if keyword is not None:
+            keywords.add(keyword)
+        elif brand_rank is None or rank < brand_rank:
+            brand_rank = rank
+    food_score = len(keywords)
+    brand = BRAND_MARKERS[brand_rank][1] if brand_rank is not None else None
+    
+    # Determine if this looks like a food item
+    # ORGANIC, FRESH, FROZEN and CANNED are food keywords already
+    is_food = food_score > 0 or brand == 'Great Value'
+    
+    if not is_food:
+        return None
+    
+    # Normalize the name
+    normalized = normalize_product_name(line)
+    
+    # Estimate confidence
+    confidence = min(0.9, 0.3 + (food_score * 0.2))
+    if brand:
+        confidence += 0.1
+    if price:
+        confidence += 0.1
+    
+    return normalized, confidence, categorize_item(normalized), price, brand
 
 @dataclass
 class ExtractedItem:
@@ -36,17 +237,24 @@ class ExtractedItem:
     quantity: Optional[str] = None
     brand: Optional[str] = None
     is_food_item: bool = True
+    # normalized_name lowercased once, for deduplication and the food database lookup
+    _name_lc: str = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self._name_lc = self.normalized_name.lower()
 
 class LLMReceiptParser:
     """LLM-powered receipt parser for intelligent item extraction"""
     
-    def __init__(self):
+    def __init__(self, ocr: Optional[OCRService] = None):
         self.logger = logging.getLogger(__name__)
         self.setup_llm()
         
         # Load USDA food database
-        with open('/app/data/enhanced_food_database.json', 'r') as f:
-            self.food_database = json.load(f)
+        self.food_database = load_food_database()
+        
+        # Shared OCR engine (a warm PaddleOCR model, or Tesseract)
+        self.ocr = ocr or OCRService(engine=settings.ocr_engine)
             
         # Common receipt patterns to ignore
         self.ignore_patterns = [
@@ -61,14 +269,19 @@ class LLMReceiptParser:
             r'REF\s*#|APPR\s*CODE',  # Reference numbers
             r'THANK\s*YOU|VISIT',  # Thank you messages
         ]
+        # One alternation checked per line instead of a re.search per pattern
+        self._ignore_re = re.compile("|".join(f"(?:{p})" for p in self.ignore_patterns), re.IGNORECASE)
+        self._numeric_only_re = re.compile(r'^[\d\s\-\.\$\(\)]+$')
     
     def setup_llm(self):
         """Initialize LLM (OpenAI or local model)"""
         if OPENAI_AVAILABLE and os.getenv('OPENAI_API_KEY'):
+            import openai
             self.llm_type = 'openai'
             openai.api_key = os.getenv('OPENAI_API_KEY')
             self.logger.info("Using OpenAI GPT for intelligent parsing")
         elif TRANSFORMERS_AVAILABLE:
+            from transformers import AutoTokenizer, AutoModelForCausalLM
             self.llm_type = 'local'
             # Use a smaller, efficient model for local inference
             model_name = "microsoft/DialoGPT-small"  # Lightweight option
@@ -82,7 +295,7 @@ class LLMReceiptParser:
     def extract_receipt_items(self, image: Image.Image) -> List[ExtractedItem]:
         """Extract and intelligently parse items from receipt image"""
         # Step 1: OCR extraction
-        ocr_text = pytesseract.image_to_string(image)
+        ocr_text = self.ocr.extract_text(image)
         self.logger.info(f"OCR extracted {len(ocr_text)} characters")
         
         # Step 2: Pre-process and filter lines
@@ -101,6 +314,24 @@ class LLMReceiptParser:
         
         return enriched_items
     
+    def extract_receipt_items_batch(self, images: List[Image.Image]) -> List[List[ExtractedItem]]:
+        """extract_receipt_items for several receipts: OCR runs as one batch and,
+        with OpenAI, the receipts are parsed by concurrent requests"""
+        ocr_texts = self.ocr.extract_texts_batch(images)
+        self.logger.info(f"OCR extracted {sum(map(len, ocr_texts))} characters from {len(images)} receipts")
+        
+        batches = [self.preprocess_ocr_text(ocr_text) for ocr_text in ocr_texts]
+        
+        if self.llm_type == 'openai':
+            # Runs in a worker thread, so there is no event loop to reuse
+            parsed = asyncio.run(self.parse_with_openai_async(batches))
+        elif self.llm_type == 'local':
+            parsed = [self.parse_with_local_llm(lines) for lines in batches]
+        else:
+            parsed = [self.parse_with_rules(lines) for lines in batches]
+        
+        return [self.enrich_with_shelf_life(items) for items in parsed]
+    
     def preprocess_ocr_text(self, text: str) -> List[str]:
         """Clean and filter OCR text to relevant lines"""
         lines = [line.strip() for line in text.split('\n') if line.strip()]
@@ -109,7 +340,7 @@ class LLMReceiptParser:
         filtered_lines = []
         for line in lines:
             # Skip if matches ignore patterns
-            if any(re.search(pattern, line, re.IGNORECASE) for pattern in self.ignore_patterns):
+            if self._ignore_re.search(line):
                 continue
             
             # Skip very short lines (likely fragments)
@@ -117,7 +348,7 @@ class LLMReceiptParser:
                 continue
                 
             # Skip lines with only numbers/special chars
-            if re.match(r'^[\d\s\-\.\$\(\)]+$', line):
+            if self._numeric_only_re.match(line):
                 continue
                 
             filtered_lines.append(line)
@@ -125,40 +356,78 @@ class LLMReceiptParser:
         self.logger.info(f"Filtered to {len(filtered_lines)} relevant lines from {len(lines)} total")
         return filtered_lines
     
+    def _build_prompt(self, lines: List[str]) -> str:
+        return OPENAI_PROMPT_TEMPLATE.format(lines="\n".join(lines))
+    
+    def _request_body(self, prompt: str) -> Dict[str, Any]:
+        return {
+            "model": OPENAI_MODEL,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.1,
+            # JSON mode: the reply always parses, so the happy path never
+            # falls back to rule-based parsing over a formatting slip
+            "response_format": {"type": "json_object"}
+        }
+    
+    def _parse_openai_content(self, content: str) -> List[ExtractedItem]:
+        result = orjson.loads(content)
+        if isinstance(result, dict):
+            result = result.get("items", [])
+        return [ExtractedItem(**item) for item in result]
+    
+    def _call_openai(self, prompt: str) -> str:
+        import openai
+        # Streamed so a long receipt's reply keeps the connection busy instead of
+        # idling until the last token; the JSON is still parsed once complete
+        stream = openai.chat.completions.create(**self._request_body(prompt), stream=True)
+        return "".join(chunk.choices[0].delta.content or "" for chunk in stream if chunk.choices)
+    
     def parse_with_openai(self, lines: List[str]) -> List[ExtractedItem]:
         """Use OpenAI GPT to intelligently parse receipt lines"""
-        prompt = f"""
-        Analyze this grocery receipt text and extract only actual food/grocery items.
-        Ignore store info, addresses, payment details, staff names, etc.
-        
-        Receipt lines:
-        {chr(10).join(lines)}
-        
-        For each actual grocery item found, provide:
-        - raw_text: exact text from receipt
-        - normalized_name: clean product name
-        - confidence: 0.0-1.0 how confident this is a food item
-        - category: food category (dairy, produce, meat, etc.)
-        - price: if extractable from line
-        - brand: if identifiable
-        
-        Return as JSON array. Only include actual grocery products, not store metadata.
-        """
-        
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1
-            )
-            
-            result = json.loads(response.choices[0].message.content)
-            return [ExtractedItem(**item) for item in result]
-            
+            return self._parse_openai_content(self._call_openai(self._build_prompt(lines)))
         except Exception as e:
             self.logger.error(f"OpenAI parsing failed: {e}")
             return self.parse_with_rules(lines)
     
+    async def _call_openai_async(self, client, prompt: str, semaphore: asyncio.Semaphore) -> str:
+        """One chat completion, retried with exponential backoff"""
+        async with semaphore:
+            for attempt in range(OPENAI_MAX_RETRIES):
+                try:
+                    response = await client.chat.completions.create(**self._request_body(prompt))
+                    return response.choices[0].message.content
+                except Exception as e:
+                    if attempt == OPENAI_MAX_RETRIES - 1:
+                        raise
+                    delay = 2 ** attempt
+                    self.logger.warning(f"OpenAI request failed ({e}); retrying in {delay}s")
+                    await asyncio.sleep(delay)
+    
+    async def parse_with_openai_async(self, batches: List[List[str]]) -> List[List[ExtractedItem]]:
+        """Parse several receipts' lines concurrently, at most OPENAI_MAX_CONCURRENCY at a time.
+        Receipts whose request or response fails fall back to rule-based parsing."""
+        import openai
+        semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+        prompts = [self._build_prompt(lines) for lines in batches]
+        # One client per call: its connection pool is bound to the running event
+        # loop, and every extract_receipt_items_batch runs its own loop
+        async with openai.AsyncOpenAI() as client:
+            contents = await asyncio.gather(
+                *[self._call_openai_async(client, prompt, semaphore) for prompt in prompts],
+                return_exceptions=True
+            )
+        results = []
+        for lines, content in zip(batches, contents):
+            try:
+                if isinstance(content, BaseException):
+                    raise content
+                results.append(self._parse_openai_content(content))
+            except Exception as e:
+                self.logger.error(f"OpenAI parsing failed: {e}")
+                results.append(self.parse_with_rules(lines))
+        return results
+    
     def parse_with_local_llm(self, lines: List[str]) -> List[ExtractedItem]:
         """Use local transformer model for parsing"""
         # For now, implement rule-based with local LLM enhancement
@@ -183,57 +452,15 @@ class LLMReceiptParser:
     
     def extract_item_from_line(self, line: str) -> Optional[ExtractedItem]:
         """Extract item details from a single receipt line"""
-        # Common grocery item patterns
-        food_keywords = [
-            'BREAD', 'MILK', 'EGGS', 'BUTTER', 'CHEESE', 'MEAT', 'CHICKEN', 'BEEF',
-            'PORK', 'FISH', 'FRUIT', 'BANANA', 'APPLE', 'ORANGE', 'VEGETABLE',
-            'TOMATO', 'ONION', 'POTATO', 'RICE', 'PASTA', 'CEREAL', 'COFFEE',
-            'TEA', 'JUICE', 'SODA', 'YOGURT', 'CREAM', 'BAGEL', 'MUFFIN',
-            'PIZZA', 'SANDWICH', 'SOUP', 'SAUCE', 'OIL', 'SUGAR', 'FLOUR',
-            'SALT', 'PEPPER', 'SPICE', 'CONDIMENT', 'PEANUT', 'NUT', 'COOKIE',
-            'CAKE', 'ICE CREAM', 'FROZEN', 'CANNED', 'ORGANIC', 'FRESH'
-        ]
-        
-        # Extract price if present
-        price_match = re.search(r'(\d+\.\d{2})', line)
-        price = float(price_match.group(1)) if price_match else None
-        
-        # Check for food keywords
-        line_upper = line.upper()
-        food_score = sum(1 for keyword in food_keywords if keyword in line_upper)
-        
-        # Store brand recognition
-        brand = None
-        if 'GV ' in line_upper:
-            brand = 'Great Value'
-        elif 'KROGER' in line_upper:
-            brand = 'Kroger'
-        elif 'FOLGERS' in line_upper:
-            brand = 'Folgers'
-        
-        # Determine if this looks like a food item
-        is_food = food_score > 0 or any(pattern in line_upper for pattern in [
-            'GV ', 'ORGANIC', 'FRESH', 'FROZEN', 'CANNED'
-        ])
-        
-        if not is_food:
+        fields = analyze_line(line)
+        if fields is None:
             return None
-        
-        # Normalize the name
-        normalized = self.normalize_product_name(line)
-        
-        # Estimate confidence
-        confidence = min(0.9, 0.3 + (food_score * 0.2))
-        if brand:
-            confidence += 0.1
-        if price:
-            confidence += 0.1
-        
+        normalized, confidence, category, price, brand = fields
         return ExtractedItem(
             raw_text=line,
             normalized_name=normalized,
             confidence=confidence,
-            category=self.categorize_item(normalized),
+            category=category,
             price=price,
             brand=brand,
             is_food_item=True
@@ -241,136 +468,107 @@ class LLMReceiptParser:
     
     def normalize_product_name(self, raw_text: str) -> str:
         """Clean and normalize product names"""
-        # Remove SKU/barcode numbers
-        text = re.sub(r'\d{10,}', '', raw_text)
-        
-        # Remove transaction codes
-        text = re.sub(r'[FNX]\s*\d+\.\d{2}', '', text)
-        text = re.sub(r'ST#.*|OP#.*|TE#.*|TR#.*', '', text)
-        
-        # Clean up common abbreviations
-        replacements = {
-            'GV ': 'Great Value ',
-            'PNT BUTTR': 'Peanut Butter',
-            'CHNK CHKN': 'Chunk Chicken',
-            'PARM': 'Parmesan',
-            'WHL MLK': 'Whole Milk',
-            'ORG': 'Organic',
-        }
-        
-        for abbrev, full in replacements.items():
-            text = text.replace(abbrev, full)
-        
-        # Remove extra whitespace and clean
-        text = ' '.join(text.split())
-        text = text.strip()
-        
-        return text
+        return normalize_product_name(raw_text)
     
     def categorize_item(self, item_name: str) -> str:
         """Categorize food items"""
-        item_upper = item_name.upper()
-        
-        if any(word in item_upper for word in ['BREAD', 'BAGEL', 'MUFFIN', 'ROLL']):
-            return 'Bakery'
-        elif any(word in item_upper for word in ['MILK', 'CHEESE', 'BUTTER', 'YOGURT', 'CREAM']):
-            return 'Dairy'
-        elif any(word in item_upper for word in ['CHICKEN', 'BEEF', 'PORK', 'FISH', 'MEAT']):
-            return 'Meat & Seafood'
-        elif any(word in item_upper for word in ['FRUIT', 'VEGETABLE', 'BANANA', 'APPLE', 'TOMATO']):
-            return 'Produce'
-        elif any(word in item_upper for word in ['FROZEN', 'ICE CREAM']):
-            return 'Frozen'
-        elif any(word in item_upper for word in ['COFFEE', 'TEA', 'JUICE', 'SODA']):
-            return 'Beverages'
-        elif any(word in item_upper for word in ['PEANUT', 'NUT', 'BUTTER']):
-            return 'Pantry'
-        else:
-            return 'Grocery'
+        return categorize_item(item_name)
     
     def deduplicate_items(self, items: List[ExtractedItem]) -> List[ExtractedItem]:
         """Remove duplicate items based on normalized names"""
-        seen = {}
-        unique_items = []
-        
+        # Keep the most confident item per lowercased name, in first-seen order
+        seen: Dict[str, ExtractedItem] = {}
         for item in items:
-            key = item.normalized_name.lower()
-            if key not in seen or item.confidence > seen[key].confidence:
+            key = item._name_lc
+            current = seen.get(key)
+            if current is None or item.confidence > current.confidence:
                 seen[key] = item
-        
         return list(seen.values())
     
     def enrich_with_shelf_life(self, items: List[ExtractedItem]) -> List[ExtractedItem]:
         """Add shelf life information from USDA database"""
         for item in items:
             # Try to match with food database
-            best_match = self.find_best_food_match(item.normalized_name)
-            if best_match:
-                item.shelf_life_data = best_match
+            best = best_food_match_index(item._name_lc)
+            if best is not None and self.food_database[best]:
+                item.shelf_life_data = self.food_database[best]
         
         return items
     
     def find_best_food_match(self, item_name: str) -> Optional[Dict[str, Any]]:
         """Find best matching food item in USDA database"""
-        item_lower = item_name.lower()
-        
-        # Direct name matches first
-        for food_item in self.food_database:
-            if food_item['name'].lower() in item_lower or item_lower in food_item['name'].lower():
-                return food_item
-        
-        # Keyword matching
-        best_score = 0
-        best_match = None
-        
-        for food_item in self.food_database:
-            food_keywords = food_item['name'].lower().split()
-            item_keywords = item_lower.split()
-            
-            score = len(set(food_keywords) & set(item_keywords))
-            if score > best_score:
-                best_score = score
-                best_match = food_item
-        
-        return best_match if best_score > 0 else None
+        # Direct name matches first (either way round), then the most shared keywords
+        best = best_food_match_index(item_name.lower())
+        return self.food_database[best] if best is not None else None
+
+# Shared parser: construction sets up the LLM client or loads a local model,
+# so it happens once per process rather than once per receipt
+_PARSER: Optional[LLMReceiptParser] = None
+_PARSER_LOCK = threading.Lock()
+
+def get_parser() -> LLMReceiptParser:
+    """The process-wide LLMReceiptParser, created on first use"""
+    global _PARSER
+    if _PARSER is None:
+        with _PARSER_LOCK:
+            if _PARSER is None:
+                _PARSER = LLMReceiptParser()
+    return _PARSER
+
+def _item_payload(item: ExtractedItem) -> Dict[str, Any]:
+    processed_item = {
+        "raw_text": item.raw_text,
+        "normalized_name": item.normalized_name,
+        "confidence": item.confidence,
+        "category": item.category,
+        "price": item.price,
+        "brand": item.brand,
+        "is_food_item": item.is_food_item
+    }
+    
+    if hasattr(item, 'shelf_life_data') and item.shelf_life_data:
+        processed_item["shelf_life"] = item.shelf_life_data
+    
+    return processed_item
+
+def _receipt_payload(items: List[ExtractedItem], parsing_method: str) -> Dict[str, Any]:
+    # Convert to API response format
+    processed_items = [_item_payload(item) for item in items]
+    return {
+        "success": True,
+        "total_items": len(processed_items),
+        "items": processed_items,
+        "parsing_method": parsing_method,
+        "message": f"Successfully extracted {len(processed_items)} grocery items"
+    }
 
 # Enhanced API endpoint function
 def process_receipt_with_llm(image: Image.Image) -> Dict[str, Any]:
     """Process receipt with LLM-enhanced parsing"""
-    parser = LLMReceiptParser()
+    parser = get_parser()
     
     try:
         items = parser.extract_receipt_items(image)
+        return _receipt_payload(items, parser.llm_type)
         
-        # Convert to API response format
-        processed_items = []
-        for item in items:
-            processed_item = {
-                "raw_text": item.raw_text,
-                "normalized_name": item.normalized_name,
-                "confidence": item.confidence,
-                "category": item.category,
-                "price": item.price,
-                "brand": item.brand,
-                "is_food_item": item.is_food_item
-            }
-            
-            if hasattr(item, 'shelf_life_data') and item.shelf_life_data:
-                processed_item["shelf_life"] = item.shelf_life_data
-            
-            processed_items.append(processed_item)
-        
+    except Exception as e:
         return {
-            "success": True,
-            "total_items": len(processed_items),
-            "items": processed_items,
-            "parsing_method": parser.llm_type,
-            "message": f"Successfully extracted {len(processed_items)} grocery items"
+            "success": False,
+            "error": str(e),
+            "message": "Failed to process receipt"
         }
+
+def process_receipts_with_llm(images: List[Image.Image]) -> List[Dict[str, Any]]:
+    """Process several receipts with LLM-enhanced parsing, one result per image"""
+    parser = get_parser()
+    
+    try:
+        receipts = parser.extract_receipt_items_batch(images)
+        return [_receipt_payload(items, parser.llm_type) for items in receipts]
         
     except Exception as e:
-        return {
+        return [{
             "success": False,
             "error": str(e),
             "message": "Failed to process receipt"
-        }
+        } for _ in images]
\ No newline at end of file
@@ -1,8 +1,29 @@
-from typing import List, Tuple
+from collections import Counter, defaultdict
+from itertools import islice
+from typing import Dict, List, Tuple
 import re
+import ahocorasick
 from app.services.embedding_service import EmbeddingService
 from app.services.shelf_life_service import ShelfLifeService
 
+# Compiled once; _normalize runs for every receipt line
+QTY_RE = re.compile(r"\b\d+\s*(lb|lbs|oz|ct|pk|pkg|ea)\b", re.I)
+TRAILING_PRICE_RE = re.compile(r"\$?\d+[\d\.,]*$")
+# Separators split like whitespace when expanding tokens
+SEP_TABLE = str.maketrans("-_/", "   ")
+WORD_RE = re.compile(r"[a-z]+")
+
+# Canonical names matched outright when every keyword appears in the expanded line
+CONFIDENT_RULES = (
+    ("Onion, fresh", ("onion",)),
+    ("Green Bell Pepper", ("green", "bell", "pepper")),
+)
+RULE_AUTOMATON = ahocorasick.Automaton()
+for _, _keywords in CONFIDENT_RULES:
+    for _keyword in _keywords:
+        RULE_AUTOMATON.add_word(_keyword, _keyword)
+RULE_AUTOMATON.make_automaton()
+
 
 class MatchingService:
     def __init__(self, embedding: EmbeddingService | None = None, shelf_life: ShelfLifeService | None = None, threshold: float = 0.8):
@@ -28,6 +49,11 @@ class MatchingService:
                 "Potatoes",
                 "Tomatoes",
             ]
+        # Word -> indices of the canonical names containing it, for _suggestions
+        self._token_index: Dict[str, List[int]] = defaultdict(list)
+        for i, name in enumerate(self.canonical_names):
+            for token in set(WORD_RE.findall(name.lower())):
+                self._token_index[token].append(i)
         if self.embedding:
             self.embedding.load_canonical(self.canonical_names)
 
@@ -48,51 +74,74 @@ class MatchingService:
 
     def _normalize(self, text: str) -> str:
         text = text.strip()
-        text = re.sub(r"\b\d+\s*(lb|lbs|oz|ct|pk|pkg|ea)\b", "", text, flags=re.I)
-        text = re.sub(r"\$?\d+[\d\.,]*$", "", text).strip()
-        return re.sub(r"\s+", " ", text)
+        text = QTY_RE.sub("", text)
+        text = TRAILING_PRICE_RE.sub("", text).strip()
+        return " ".join(text.split())
 
     def _expand_tokens(self, text: str) -> str:
-        tokens = re.split(r"\s+|[-_/]", text.lower())
-        out: List[str] = []
-        for t in tokens:
-            if not t:
-                continue
-            out.append(self.token_map.get(t, t))
-        return " ".join(out).strip()
+        tokens = text.lower().translate(SEP_TABLE).split()
+        return " ".join([self.token_map.get(t, t) for t in tokens])
 
     def _confident_rules(self, norm_text: str, expanded: str) -> str | None:
-        if "onion" in expanded:
-            return "Onion, fresh"
-        if all(k in expanded for k in ["green", "bell", "pepper"]):
-            return "Green Bell Pepper"
+        found = {keyword for _, keyword in RULE_AUTOMATON.iter(expanded)}
+        if not found:
+            return None
+        for name, keywords in CONFIDENT_RULES:
+            if found.issuperset(keywords):
+                return name
         return None
 
     def match_item(self, item_name: str) -> str | Tuple[None, List[str]]:
-        norm = self._normalize(item_name)
-        expanded = self._expand_tokens(norm)
-        direct = self._confident_rules(norm, expanded)
-        if direct:
-            return direct
+        return self.match_items([item_name])[0]
+
+    def match_items(self, item_names: List[str]) -> List[str | Tuple[None, List[str]]]:
+        """Match several lines at once; embedding lookups share one batched encode.
+
+        Receipts often repeat a line ("GV MILK" twice, or the same text with
+        different spacing), so each distinct line is matched only once.
+        """
+        keys = [" ".join(name.lower().split()) for name in item_names]
+        unique = list(dict.fromkeys(keys))
+        results_by_key = dict(zip(unique, self._match_unique(unique)))
+        return [results_by_key[key] for key in keys]
 
-        if self.embedding and self.embedding.canonical_embs is not None:
-            top = self.embedding.top_k(expanded, k=3)
-            if not top:
-                return None, self._suggestions(expanded)
-            best_name, best_score = top[0]
-            if best_score >= self.threshold:
-                return best_name
-            return None, [n for n, _ in top]
+    def _match_unique(self, item_names: List[str]) -> List[str | Tuple[None, List[str]]]:
+        results: List[str | Tuple[None, List[str]] | None] = []
+        pending: List[Tuple[int, str]] = []
+        for item_name in item_names:
+            norm = self._normalize(item_name)
+            expanded = self._expand_tokens(norm)
+            direct = self._confident_rules(norm, expanded)
+            if direct:
+                results.append(direct)
+            elif self.embedding and self.embedding.canonical_embs is not None:
+                pending.append((len(results), expanded))
+                results.append(None)
+            else:
+                # Fallback heuristic suggestions
+                results.append((None, self._suggestions(expanded)))
 
-        # Fallback heuristic suggestions
-        return None, self._suggestions(expanded)
+        if pending:
+            tops = self.embedding.top_k_batch([expanded for _, expanded in pending], k=3)
+            for (i, expanded), top in zip(pending, tops):
+                if not top:
+                    results[i] = (None, self._suggestions(expanded))
+                    continue
+                best_name, best_score = top[0]
+                if best_score >= self.threshold:
+                    results[i] = best_name
+                else:
+                    results[i] = (None, [n for n, _ in top])
+        return results
 
     def _suggestions(self, expanded: str, top_n: int = 3) -> List[str]:
-        scores = []
-        for name in self.canonical_names:
-            name_tokens = set(re.findall(r"[a-z]+", name.lower()))
-            query_tokens = set(re.findall(r"[a-z]+", expanded))
-            overlap = len(name_tokens & query_tokens)
-            scores.append((name, overlap))
-        scores.sort(key=lambda x: x[1], reverse=True)
-        return [n for n, _ in scores[:top_n]] or self.canonical_names[:top_n]
\ No newline at end of file
+        # Count shared words over the posting lists instead of scanning every name
+        overlap: Counter = Counter()
+        for token in set(WORD_RE.findall(expanded)):
+            overlap.update(self._token_index.get(token, ()))
+        best = sorted(overlap, key=lambda i: (-overlap[i], i))[:top_n]
+        if len(best) < top_n:
+            # Pad with the first names sharing nothing, as a full sort would
+            chosen = set(best)
+            best += islice((i for i in range(len(self.canonical_names)) if i not in chosen), top_n - len(best))
+        return [self.canonical_names[i] for i in best]
\ No newline at end of file
@@ -1,26 +1,96 @@
-from typing import Iterable, List, Optional, Union
+from typing import Iterable, List, Optional, Sequence, Union
+from concurrent.futures import ThreadPoolExecutor
 import os
-try:
-    from paddleocr import PaddleOCR  # type: ignore
-except Exception:  # pragma: no cover - optional dependency in tests
-    PaddleOCR = None  # type: ignore
+import hashlib
+import queue
+import threading
 from PIL import Image
+import cachetools
 import numpy as np
 import io
+import re
+from app.core.config import settings
 from app.core.logging import get_logger
+from app.utils.image_preprocessing import prepare_for_ocr
+
+# Totals, payment and card lines; one regex pass over the lowercased line
+NON_ITEM_RE = re.compile("total|subtotal|tax|change|visa|mastercard|debit|credit")
+# Token shapes dropped from item lines, matched with fullmatch:
+# prices ($2.99, 2.99, 10, commas already removed), quantities with a digit
+# and a unit suffix (16OZ, 3LB, 12CT, 2PK, 1EA) or a bare EA, and UPC/EAN-like
+# runs of 8+ digits that may contain hyphens
+PRICE_RE = re.compile(r"\$?(?:\d+\.?\d*|\.\d+)")
+QTY_RE = re.compile(r"(?=.*\d).*(?:OZ|LBS?|CT|PKG?|EA)|EA", re.I)
+UPC_RE = re.compile(r"-*(?:\d-*){8,}")
+# Single-letter tax/status flags printed beside prices
+FLAG_TOKENS = frozenset({"f", "n", "o"})
+# Everything dropped from the middle of an item line in one fullmatch:
+# UPC_RE, a FLAG_TOKENS letter or QTY_RE
+DROP_TOKEN_RE = re.compile(
+    f"(?:{UPC_RE.pattern})|[{''.join(sorted(FLAG_TOKENS))}]|(?:{QTY_RE.pattern})", re.I
+)
+
+# Inputs extract_text accepts: decoded images or encoded image bytes
+IMAGE_TYPES = (Image.Image, np.ndarray, bytes, bytearray, io.BytesIO)
+
+def _advise_willneed(path: str) -> None:
+    # Start the kernel's readahead of path; purely a hint, so failures are ignored
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
 class OCRService:
+    # EasyOCR readers by language, shared by every instance: loading one puts
+    # its models on the GPU
+    _easyocr_readers: dict = {}
+
     def __init__(self, lang: str = 'en', engine: Optional[str] = None):
-        # Engine can be 'PaddleOCR' or 'Tesseract'
+        # Engine can be 'PaddleOCR', 'EasyOCR' or 'Tesseract'
         self.engine = (engine or os.getenv('OCR_ENGINE', 'PaddleOCR')).strip()
         self.lang = lang
         self.ocr = None
         self.logger = get_logger()
+        # Receipts are one uniform block of text: PSM 6 skips Tesseract's page
+        # layout analysis, OEM 1 runs only the LSTM recognizer
+        self._tess_config = os.getenv('TESSERACT_CONFIG', '--oem 1 --psm 6')
+        # Re-uploads and retries send identical images and OCR is deterministic,
+        # so extracted text is cached by content hash. Guarded by a lock because
+        # extract_texts_batch's threads share it.
+        self._text_cache: cachetools.LRUCache = cachetools.LRUCache(maxsize=max(1, settings.ocr_cache_size))
+        self._text_cache_lock = threading.Lock()
         if self.engine.lower() == 'paddleocr':
+            # Imported here so Tesseract-only deployments never load Paddle
+            try:
+                from paddleocr import PaddleOCR  # type: ignore
+            except Exception:  # pragma: no cover - optional dependency in tests
+                PaddleOCR = None  # type: ignore
             if PaddleOCR:
                 try:
                     # Initialize once; PaddleOCR lazy-loads models on first use.
-                    self.ocr = PaddleOCR(lang=lang, use_angle_cls=True)
+                    # PP-OCRv4 defaults to the mobile det/rec models; FP16 on GPU,
+                    # oneDNN kernels on CPU. PADDLE_DET_DIR/PADDLE_REC_DIR override the models.
+                    use_gpu = os.getenv('PADDLE_GPU', '0') == '1'
+                    self.ocr = PaddleOCR(
+                        lang=lang,
+                        use_angle_cls=True,
+                        ocr_version='PP-OCRv4',
+                        det_model_dir=os.getenv('PADDLE_DET_DIR'),
+                        rec_model_dir=os.getenv('PADDLE_REC_DIR'),
+                        use_gpu=use_gpu,
+                        precision=os.getenv('PADDLE_PRECISION', 'fp16' if use_gpu else 'fp32'),
+                        enable_mkldnn=True,
+                        cpu_threads=int(os.getenv('OMP_NUM_THREADS', '4')),
+                        show_log=False,
+                    )
                     self.logger.info("OCR initialized: PaddleOCR")
                 except Exception:
                     # PaddleOCR installed but backend 'paddle' missing or other init error
@@ -29,6 +99,13 @@ class OCRService:
             else:
                 self.ocr = None
                 self.logger.error("PaddleOCR package not available; will attempt Tesseract fallback at runtime.")
+        elif self.engine.lower() == 'easyocr':
+            # Worth it only on a GPU; on CPU Tesseract is faster, so fall back to it
+            self.ocr = self._easyocr_reader(lang)
+            if self.ocr is not None:
+                self.logger.info("OCR initialized: EasyOCR (GPU)")
+            else:
+                self.logger.warning("EasyOCR needs easyocr and a CUDA GPU; will use Tesseract.")
         elif self.engine.lower() == 'tesseract':
             # pytesseract is imported lazily in extract_text
             self.logger.info("OCR configured: Tesseract")
@@ -37,24 +114,93 @@ class OCRService:
             self.ocr = None
             self.logger.error("Unknown OCR engine configured: %s", self.engine)
 
-    def _to_numpy(self, image: Union[Image.Image, bytes, bytearray, io.BytesIO]) -> np.ndarray:
-        if image is None:
-            raise ValueError("image is None")
+    @classmethod
+    def _easyocr_reader(cls, lang: str):
+        """The shared GPU EasyOCR reader for lang, or None without easyocr or CUDA"""
+        readers = cls._easyocr_readers
+        if lang not in readers:
+            reader = None
+            try:
+                import torch  # type: ignore
+                import easyocr  # type: ignore
+            except Exception:  # pragma: no cover - optional dependency
+                pass
+            else:
+                if torch.cuda.is_available():
+                    reader = easyocr.Reader([lang], gpu=True, verbose=False)
+            readers[lang] = reader
+        return readers[lang]
+
+    def _open_image(self, image: Union[Image.Image, np.ndarray, bytes, bytearray, io.BytesIO]) -> Image.Image:
         if isinstance(image, (bytes, bytearray)):
             image = Image.open(io.BytesIO(image))
         elif isinstance(image, io.BytesIO):
             image = Image.open(image)
+        elif isinstance(image, np.ndarray):
+            if image.dtype != np.uint8:
+                # Float or wide-integer pixels would become a 32-bit PIL image;
+                # the engines only need 8 bits per channel
+                image = np.clip(image, 0, 255).astype(np.uint8)
+            image = Image.fromarray(image)
         if isinstance(image, Image.Image):
-            image = image.convert('RGB')
-            return np.array(image)
-        raise TypeError("Unsupported image type for OCR. Provide PIL.Image or bytes.")
+            if image.mode in ('RGBA', 'LA', 'PA'):
+                # Flatten onto white: dropping alpha alone would turn a
+                # transparent background into whatever colour lies beneath it
+                image = Image.alpha_composite(Image.new('RGBA', image.size, 'white'), image.convert('RGBA')).convert('RGB')
+            return image
+        raise TypeError("Unsupported image type for OCR. Provide PIL.Image, numpy array or bytes.")
+
+    def _to_numpy(self, image: Union[Image.Image, np.ndarray, bytes, bytearray, io.BytesIO]) -> np.ndarray:
+        # RGB pixels for the Paddle and EasyOCR detectors
+        return np.array(self._open_image(image).convert('RGB'))
+
+    def _content_key(self, image) -> Optional[bytes]:
+        """Hash of the encoded bytes or decoded pixels, or None if not hashable here"""
+        digest = hashlib.blake2b(digest_size=16)
+        if isinstance(image, (bytes, bytearray)):
+            digest.update(image)
+        elif isinstance(image, io.BytesIO):
+            with image.getbuffer() as view:
+                digest.update(view)
+        elif isinstance(image, np.ndarray):
+            digest.update(f"{image.dtype}{image.shape}".encode())
+            digest.update(np.ascontiguousarray(image).data)
+        elif isinstance(image, Image.Image):
+            if getattr(image, "fp", None) is not None:
+                # Still backed by an undecoded file: a full decode here would
+                # defeat the reduced draft decode done for OCR
+                return None
+            digest.update(f"{image.mode}{image.size}".encode())
+            digest.update(image.tobytes())
+        else:
+            return None
+        return digest.digest()
 
-    def extract_text(self, image: Union[Image.Image, bytes, bytearray, io.BytesIO]) -> str:
-        np_img = self._to_numpy(image)
+    def extract_text(self, image: Union[Image.Image, np.ndarray, bytes, bytearray, io.BytesIO]) -> str:
+        # Reject bad input before hashing or loading any OCR engine
+        if not isinstance(image, IMAGE_TYPES):
+            raise TypeError(
+                f"extract_text expected PIL.Image, numpy array or bytes, got {type(image).__name__}"
+            )
+        if not settings.ocr_cache_size:
+            return self._extract_text(image)
+        key = self._content_key(image)
+        if key is None:
+            return self._extract_text(image)
+        with self._text_cache_lock:
+            text = self._text_cache.get(key)
+        if text is None:
+            text = self._extract_text(image)
+            with self._text_cache_lock:
+                self._text_cache[key] = text
+        return text
+
+    def _extract_text(self, image: Union[Image.Image, np.ndarray, bytes, bytearray, io.BytesIO]) -> str:
+        image = self._open_image(image)
         eng = self.engine.lower()
         if eng == 'paddleocr' and self.ocr:
             try:
-                result = self.ocr.ocr(np_img, cls=True)
+                result = self.ocr.ocr(self._to_numpy(image), cls=True)
             except Exception as e:
                 # Paddle failed at runtime; fall through to Tesseract
                 self.logger.error("PaddleOCR runtime error; falling back to Tesseract: %s", str(e))
@@ -66,69 +212,10 @@ class OCRService:
                     if isinstance(inner, list):
                         entries = inner
 
-                if not entries:
+                lines = self._group_lines(entries)
+                if not lines:
                     return ""
 
-                # Prepare structures: compute y-center, x-left, height, keep only confident texts
-                records = []
-                heights: List[float] = []
-                for it in entries:
-                    try:
-                        box, meta = it[0], it[1]
-                        text, conf = meta[0], float(meta[1])
-                        if not text:
-                            continue
-                        # simple confidence gate to reduce noise
-                        if conf < 0.3:
-                            continue
-                        xs = [p[0] for p in box]
-                        ys = [p[1] for p in box]
-                        x_left = float(min(xs))
-                        y_center = float(sum(ys) / 4.0)
-                        # approximate height as vertical span
-                        h = float(max(ys) - min(ys))
-                        heights.append(h)
-                        records.append((y_center, x_left, text))
-                    except Exception:
-                        continue
-
-                if not records:
-                    return ""
-
-                # Sort by y (top to bottom), then x (left to right)
-                records.sort(key=lambda r: (r[0], r[1]))
-
-                # Determine line merge threshold using median height
-                med_h = 0.0
-                if heights:
-                    hs = sorted(heights)
-                    mid = len(hs) // 2
-                    med_h = (hs[mid] if len(hs) % 2 == 1 else (hs[mid - 1] + hs[mid]) / 2.0) or 12.0
-                line_thresh = max(10.0, 0.7 * med_h)
-
-                # Group into lines
-                lines_buckets: List[List[tuple]] = []
-                current: List[tuple] = []
-                current_y = None  # type: Optional[float]
-                for y, x, t in records:
-                    if current_y is None:
-                        current = [(x, t)]
-                        current_y = y
-                        continue
-                    if abs(y - current_y) <= line_thresh:
-                        current.append((x, t))
-                    else:
-                        # flush current
-                        current.sort(key=lambda z: z[0])
-                        lines_buckets.append(current)
-                        current = [(x, t)]
-                        current_y = y
-                if current:
-                    current.sort(key=lambda z: z[0])
-                    lines_buckets.append(current)
-
-                lines: List[str] = [" ".join(t for _, t in bucket).strip() for bucket in lines_buckets if bucket]
-
                 # Debug: log a preview of OCR lines
                 try:
                     preview = " | ".join(lines[:5])
@@ -138,13 +225,20 @@ class OCRService:
 
                 return "\n".join(lines)
 
-        # Tesseract path (explicit or fallback from Paddle)
+        if eng == 'easyocr' and self.ocr:
+            # readtext gives [box, text, conf] per detected word group
+            result = self.ocr.readtext(self._to_numpy(image))
+            lines = self._group_lines([[box, (text, conf)] for box, text, conf in result])
+            return "\n".join(lines)
+
+        # Tesseract path (explicit or fallback from Paddle/EasyOCR)
         if eng == 'paddleocr' and self.ocr is None:
             self.logger.warning("Falling back to Tesseract OCR because PaddleOCR unavailable.")
 
-        if eng == 'tesseract' or (eng == 'paddleocr' and self.ocr is None):
+        if eng == 'tesseract' or (eng in ('paddleocr', 'easyocr') and self.ocr is None):
             try:
                 import pytesseract  # type: ignore
+                from app.utils import tesseract
             except Exception as e:
                 raise RuntimeError(
                     "pytesseract not installed; install it or set OCR_ENGINE=PaddleOCR with valid backend"
@@ -154,7 +248,16 @@ class OCRService:
                 tess_cmd = os.getenv('TESSERACT_CMD')
                 if tess_cmd:
                     pytesseract.pytesseract.tesseract_cmd = tess_cmd  # type: ignore[attr-defined]
-                text = pytesseract.image_to_string(Image.fromarray(np_img))
+                # Tesseract works in grayscale, capped at OCR_MAX_DIM since runtime
+                # grows with pixel count while accuracy does not. Binarizing here
+                # (OCR_BINARIZE_THRESHOLD) hands it a 1-bit page, which it OCRs
+                # without its own Otsu pass. The in-process tesserocr engine (one
+                # per thread, model loaded once) is used when available, else the
+                # tesseract binary
+                ocr_image = prepare_for_ocr(
+                    image, settings.ocr_max_dim, settings.ocr_binarize_threshold, settings.ocr_deskew
+                )
+                text = tesseract.image_to_string(ocr_image, config=self._tess_config)
                 return text
             except pytesseract.TesseractNotFoundError as e:  # type: ignore[attr-defined]
                 raise RuntimeError("Tesseract binary not found. Install Tesseract OCR and ensure it's on PATH.") from e
@@ -162,6 +265,136 @@ class OCRService:
         # No valid OCR engine available
         raise RuntimeError("No valid OCR engine available. Set OCR_ENGINE to PaddleOCR or Tesseract.")
 
+    def extract_texts_batch(self, images: Sequence[Union[Image.Image, np.ndarray, bytes, bytearray, io.BytesIO]]) -> List[str]:
+        """OCR several images, returning one text per image in order.
+
+        PaddleOCR's and EasyOCR's detectors take one image per call, so they
+        run back to back on the already-loaded model. Tesseract runs in
+        parallel threads, up to OCR_WORKERS: each thread has its own tesserocr
+        engine, which releases the GIL while recognising (or waits on its own
+        tesseract process), and OMP_THREAD_LIMIT=1 keeps them from
+        oversubscribing the cores.
+        """
+        if not images:
+            return []
+        if self.ocr:
+            return [self.extract_text(image) for image in images]
+        with ThreadPoolExecutor(max_workers=max(1, min(len(images), settings.ocr_workers))) as pool:
+            return list(pool.map(self.extract_text, images))
+
+    def extract_texts_from_files(self, paths: Sequence[str], num_prefetch: int = 3) -> List[str]:
+        """OCR image files in order while a reader thread decodes the next ones.
+
+        Up to num_prefetch decoded images wait in a queue, and the kernel is
+        asked to read ahead the file after the one being decoded, so disk and
+        decode time hide behind OCR.
+        """
+        buffered: queue.Queue = queue.Queue(maxsize=max(1, num_prefetch))
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            # Give up once the consumer has stopped instead of blocking forever
+            while not stop.is_set():
+                try:
+                    buffered.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        # Tesseract only sees a grayscale copy capped at OCR_MAX_DIM, so JPEGs
+        # can be decoded straight to that, as extract_text would on its own
+        draft = self.ocr is None
+
+        def read() -> None:
+            for i, path in enumerate(paths):
+                if i + 1 < len(paths):
+                    _advise_willneed(paths[i + 1])
+                try:
+                    with Image.open(path) as image:
+                        if draft:
+                            image.draft("L", (settings.ocr_max_dim, settings.ocr_max_dim))
+                        image.load()
+                except Exception as e:
+                    item = e
+                else:
+                    item = image
+                if not put(item):
+                    return
+
+        reader = threading.Thread(target=read, name="ocr-prefetch", daemon=True)
+        reader.start()
+        texts: List[str] = []
+        try:
+            for _ in paths:
+                item = buffered.get()
+                if isinstance(item, Exception):
+                    raise item
+                texts.append(self.extract_text(item))
+        finally:
+            stop.set()
+        return texts
+
+    def _group_lines(self, entries: list) -> List[str]:
+        """Merge PaddleOCR [box, (text, conf)] entries into reading-order text lines"""
+        # Keep only confident texts; geometry is computed for all of them at once below
+        boxes: list = []
+        texts: List[str] = []
+        for it in entries:
+            try:
+                box, meta = it[0], it[1]
+                text, conf = meta[0], float(meta[1])
+            except Exception:
+                continue
+            # simple confidence gate to reduce noise
+            if not text or conf < 0.3:
+                continue
+            boxes.append(box)
+            texts.append(text)
+        if not boxes:
+            return []
+        try:
+            pts = np.asarray(boxes, dtype=np.float64).reshape(len(boxes), 4, 2)
+        except ValueError:
+            # Not all quadrilaterals; drop the malformed boxes
+            keep = [i for i, box in enumerate(boxes) if np.shape(box) == (4, 2)]
+            if not keep:
+                return []
+            pts = np.asarray([boxes[i] for i in keep], dtype=np.float64)
+            texts = [texts[i] for i in keep]
+
+        # y-center, x-left and height (vertical span) of every box
+        ys = pts[:, :, 1]
+        y_center = ys.sum(axis=1) / 4.0
+        x_left = pts[:, :, 0].min(axis=1)
+        heights = ys.max(axis=1) - ys.min(axis=1)
+
+        # Line merge threshold from the median box height
+        med_h = float(np.median(heights)) or 12.0
+        line_thresh = max(10.0, 0.7 * med_h)
+
+        # Sort by y (top to bottom), then x (left to right); lexsort is stable
+        order = np.lexsort((x_left, y_center))
+        y_sorted = y_center[order]
+
+        # A line takes every box within line_thresh below its first box
+        lines: List[str] = []
+        n = len(order)
+        start = 0
+        while start < n:
+            line_y = y_sorted[start]
+            end = int(np.searchsorted(y_sorted, line_y + line_thresh, side="right"))
+            # Settle float rounding at the boundary against the exact test
+            while end < n and y_sorted[end] - line_y <= line_thresh:
+                end += 1
+            while end > start + 1 and y_sorted[end - 1] - line_y > line_thresh:
+                end -= 1
+            idx = order[start:end]
+            idx = idx[np.argsort(x_left[idx], kind="stable")]
+            lines.append(" ".join(texts[i] for i in idx).strip())
+            start = end
+        return lines
+
     def parse_items(self, ocr_text: str) -> List[str]:
         if not isinstance(ocr_text, str):
             raise ValueError("ocr_text must be a string")
@@ -172,29 +405,22 @@ class OCRService:
                 continue
             # Filter totals, payments, card info, prices-only lines
             lower = line.lower()
-            if any(k in lower for k in ["total", "subtotal", "tax", "change", "visa", "mastercard", "debit", "credit"]):
+            if NON_ITEM_RE.search(lower):
                 continue
             tokens = line.split()
             # Drop price-like tail tokens ($2.99, 2.99, 3 X 1.99)
-            while tokens and (self._is_price_token(tokens[-1]) or tokens[-1].lower() in {"f", "n", "o"}):
+            while tokens and (self._is_price_token(tokens[-1]) or tokens[-1].lower() in FLAG_TOKENS):
                 tokens.pop()
             if not tokens:
                 continue
 
             # Remove UPC/EAN-like or long digit-only tokens and short flags in the middle
+            # and unit-only tokens like 16OZ, 3LB, 12CT unless part of a word
             cleaned: List[str] = []
             for t in tokens:
                 t_clean = t.strip("-:;.,#")
-                if not t_clean:
-                    continue
-                if self._is_upc_like(t_clean):
-                    continue
-                if t_clean.lower() in {"f", "n", "o"}:
-                    continue
-                # remove unit-only tokens like 16OZ, 3LB, 12CT unless part of a word
-                if self._is_qty_token(t_clean):
-                    continue
-                cleaned.append(t_clean)
+                if t_clean and DROP_TOKEN_RE.fullmatch(t_clean) is None:
+                    cleaned.append(t_clean)
 
             if not cleaned:
                 continue
@@ -205,42 +431,18 @@ class OCRService:
                 items.append(core)
         return items
 
-    def _strip_trailing_qty(self, text: str) -> str:
-        tokens = text.split()
-        if not tokens:
-            return text
-        last = tokens[-1]
-        if any(last.endswith(suf) for suf in ["LB", "LBS", "OZ", "CT", "PK", "PKG", "EA"]):
-            return " ".join(tokens[:-1])
-        return text
-
     def _looks_like_item(self, line: str) -> bool:
         if len(line) < 3:
             return False
-        # Disallow lines that are mostly numbers/symbols
-        letters = sum(c.isalpha() for c in line)
-        digits = sum(c.isdigit() for c in line)
+        # Disallow lines that are mostly numbers/symbols; count both in one pass
+        letters = digits = 0
+        for c in line:
+            if c.isalpha():
+                letters += 1
+            elif c.isdigit():
+                digits += 1
         return letters >= digits and letters >= 3
 
-    def _is_upc_like(self, token: str) -> bool:
-        # UPC/EAN and similar: mostly digits and length >= 8
-        if len(token) >= 8 and token.isdigit():
-            return True
-        # allow tokens with hyphens/spaces removed
-        comp = token.replace("-", "")
-        return len(comp) >= 8 and comp.isdigit()
-
-    def _is_qty_token(self, token: str) -> bool:
-        t = token.upper()
-        # Patterns like 16OZ, 3LB, 12CT, 2PK, 1EA
-        return bool(
-            (any(t.endswith(suf) for suf in ["OZ", "LB", "LBS", "CT", "PK", "PKG", "EA"]) and any(ch.isdigit() for ch in t))
-            or t in {"EA"}
-        )
-
     def _is_price_token(self, token: str) -> bool:
-        t = token.strip().replace(",", "")
-        if t.startswith("$"):
-            t = t[1:]
-        # Accept 1.23 or 10 or 3x1.99
-        return t.replace(".", "", 1).isdigit()
\ No newline at end of file
+        # Accept 1.23 or 10 or $1,299.00
+        return PRICE_RE.fullmatch(token.strip().replace(",", "")) is not None
\ No newline at end of file
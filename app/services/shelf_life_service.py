@@ -1,6 +1,6 @@
 from typing import Dict, Any, Optional, List
-import json
 from pathlib import Path
+import orjson
 
 
 class ShelfLifeService:
@@ -15,17 +15,17 @@ class ShelfLifeService:
         if not path.exists():
             # Fallback to CWD-relative
             path = Path.cwd() / foodkeeper_data_path
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = orjson.loads(path.read_bytes())
         # Expect schema: { "items": [ {"name": str, "shelf_life": {..}} ] }
         self.items: List[Dict[str, Any]] = data.get("items", []) if isinstance(data, dict) else []
+        # Lowercased name -> shelf life of the first item with that name
+        self._by_name: Dict[str, Optional[Dict[str, Any]]] = {}
+        for item in self.items:
+            self._by_name.setdefault(item.get('name', '').lower(), item.get('shelf_life'))
+        self._names: List[str] = [item.get('name', '') for item in self.items if item.get('name')]
 
     def get_shelf_life(self, item_name: str) -> Optional[Dict[str, Any]]:
-        key = item_name.lower()
-        for item in self.items:
-            if item.get('name', '').lower() == key:
-                return item.get('shelf_life')
-        return None
+        return self._by_name.get(item_name.lower())
 
     def get_all_item_names(self) -> List[str]:
-        return [item.get('name', '') for item in self.items if item.get('name')]
\ No newline at end of file
+        return list(self._names)
\ No newline at end of file
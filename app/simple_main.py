@@ -1,11 +1,30 @@
 # Minimal FastAPI app for quick testing
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from PIL import Image
-import pytesseract
+import asyncio
+import os
 import io
+import queue
 import re
+import threading
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from types import MappingProxyType
 from typing import List
 
+# Tesseract's OpenMP threads fight each other under concurrent requests;
+# must be set before libtesseract is loaded
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+import ahocorasick
+import pytesseract
+
+try:
+    # In-process Tesseract: no subprocess and temp file per request
+    from tesserocr import PyTessBaseAPI
+except ImportError:
+    PyTessBaseAPI = None
+
 # Shelf life database
 SHELF_LIFE_DATA = {
     'Bread, commercial': {
@@ -107,7 +126,6 @@ FOOD_ITEMS = {
     # Pantry items
     'coffee': 'Coffee, ground',
     'folgers': 'Coffee, ground',
-    'coffee': 'Coffee, ground',
     'peanut': 'Peanut Butter',
     'pnt': 'Peanut Butter',
     'rice': 'Rice, white',
@@ -123,12 +141,83 @@ FOOD_ITEMS = {
     'marketside': 'Marketside',  # Walmart fresh brand
 }
 
-app = FastAPI(title="Enhanced OCR Receipt Service with Shelf Life")
+# One automaton pass per item finds every FOOD_ITEMS keyword; values are the
+# keyword's position in FOOD_ITEMS, whose first match wins
+FOOD_AUTOMATON = ahocorasick.Automaton()
+for rank, (keyword, food_name) in enumerate(FOOD_ITEMS.items()):
+    FOOD_AUTOMATON.add_word(keyword, (rank, food_name))
+FOOD_AUTOMATON.make_automaton()
+
+# Totals and payment lines
+SKIP_RE = re.compile(r'TOTAL|TAX|SUBTOTAL|PAYMENT|DEBIT|CREDIT')
+# Prices and codes; every digit run goes, so barcodes need no pattern of their own
+PRICE_RE = re.compile(r'\$?\d+\.?\d*')
+
+# Returned for every unmatched item, so read-only
+DEFAULT_SHELF_LIFE = MappingProxyType({
+    'pantry': 'Check packaging',
+    'fridge': 'Check packaging',
+    'freezer': 'Check packaging'
+})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Each worker loads a Tesseract engine at startup, after any fork, so the
+    # first request doesn't pay for it; engines' native state is freed on shutdown.
+    # The automaton and patterns stay import-time, shared copy-on-write by preloaded workers.
+    await asyncio.to_thread(_warm_api)
+    yield
+    while True:
+        try:
+            api = _APIS.get_nowait()
+        except queue.Empty:
+            break
+        api.End()
+
+app = FastAPI(title="Enhanced OCR Receipt Service with Shelf Life", lifespan=lifespan)
+
+# Idle tesserocr engines, created on demand. The Tesseract API is not thread-safe,
+# so each OCR checks one out; the semaphore caps them at one per CPU.
+_APIS: "queue.SimpleQueue" = queue.SimpleQueue()
+_API_SLOTS = threading.Semaphore(os.cpu_count() or 1)
+
+def _checkout_api():
+    """An idle tesserocr engine, or None to fall back to pytesseract"""
+    global PyTessBaseAPI
+    try:
+        return _APIS.get_nowait()
+    except queue.Empty:
+        pass
+    if PyTessBaseAPI is None:
+        return None
+    try:
+        return PyTessBaseAPI()
+    except RuntimeError:
+        # Usually missing tessdata; the tesseract binary may still work
+        PyTessBaseAPI = None
+        return None
+
+def _warm_api():
+    api = _checkout_api()
+    if api is not None:
+        _APIS.put(api)
 
 def extract_text(image_bytes: bytes) -> str:
     """Simple OCR using Tesseract"""
     try:
         image = Image.open(io.BytesIO(image_bytes))
+        # Tesseract works in grayscale: JPEGs decode straight to it, skipping
+        # libjpeg's color conversion (a no-op for other formats)
+        image.draft("L", image.size)
+        if PyTessBaseAPI is not None:
+            with _API_SLOTS:
+                api = _checkout_api()
+                if api is not None:
+                    try:
+                        api.SetImage(image)
+                        return api.GetUTF8Text()
+                    finally:
+                        _APIS.put(api)
         text = pytesseract.image_to_string(image)
         return text
     except Exception as e:
@@ -137,35 +226,37 @@ def extract_text(image_bytes: bytes) -> str:
 def parse_items(text: str) -> List[str]:
     """Extract likely food items from OCR text"""
     items = []
-    for line in text.split('\n'):
-        line = line.strip().upper()
+    # Uppercase and strip prices and codes over the whole text in one pass each;
+    # neither touches newlines, so the two splits stay line-aligned
+    upper = text.upper()
+    for line, cleaned in zip(upper.split('\n'), PRICE_RE.sub('', upper).split('\n')):
+        line = line.strip()
         if len(line) < 3:
             continue
         # Skip obvious non-food lines
-        if any(skip in line for skip in ['TOTAL', 'TAX', 'SUBTOTAL', 'PAYMENT', 'DEBIT', 'CREDIT']):
+        if SKIP_RE.search(line):
             continue
-        # Remove prices and codes
-        line = re.sub(r'\$?\d+\.?\d*', '', line)
-        line = re.sub(r'\b\d{8,}\b', '', line)  # Remove long numbers (barcodes)
-        line = re.sub(r'\s+', ' ', line).strip()
+        # Collapse whitespace
+        line = ' '.join(cleaned.split())
         
-        if len(line) > 2 and any(c.isalpha() for c in line):
+        if len(line) > 2 and any(map(str.isalpha, line)):
             items.append(line)
     return items
 
 def match_food_item(item_text: str) -> tuple[str, dict]:
     """Enhanced keyword matching with multiple attempts and shelf life lookup"""
-    item_lower = item_text.lower()
+    return _match_food_item_cached(item_text.lower())
+
+@lru_cache(maxsize=4096)
+def _match_food_item_cached(item_lower: str) -> tuple[str, dict]:
+    # Memoized: receipts repeat lines (duplicate SKU rows) and stores repeat items.
+    # The shelf life dicts returned are shared; callers must not modify them.
     
     # Direct keyword matching
-    for keyword, food_name in FOOD_ITEMS.items():
-        if keyword in item_lower:
-            shelf_life = SHELF_LIFE_DATA.get(food_name, {
-                'pantry': 'Check packaging',
-                'fridge': 'Check packaging', 
-                'freezer': 'Check packaging'
-            })
-            return food_name, shelf_life
+    matches = [value for _, value in FOOD_AUTOMATON.iter(item_lower)]
+    if matches:
+        _, food_name = min(matches)
+        return food_name, SHELF_LIFE_DATA.get(food_name, DEFAULT_SHELF_LIFE)
     
     # Special cases for common abbreviations
     if 'pnt' in item_lower and 'buttr' in item_lower:
@@ -178,18 +269,10 @@ def match_food_item(item_text: str) -> tuple[str, dict]:
         elif 'bread' in item_lower or 'brd' in item_lower:
             return 'Bread, commercial', SHELF_LIFE_DATA['Bread, commercial']
         else:
-            return 'Great Value Product', {
-                'pantry': 'Check packaging',
-                'fridge': 'Check packaging',
-                'freezer': 'Check packaging'
-            }
+            return 'Great Value Product', DEFAULT_SHELF_LIFE
     
     # Fallback
-    return "Unknown food item", {
-        'pantry': 'Check packaging',
-        'fridge': 'Check packaging',
-        'freezer': 'Check packaging'
-    }
+    return "Unknown food item", DEFAULT_SHELF_LIFE
 
 @app.get("/health")
 async def health():
@@ -203,8 +286,8 @@ async def extract_receipt_items(file: UploadFile = File(...)):
     
     content = await file.read()
     
-    # Extract text using OCR
-    ocr_text = extract_text(content)
+    # Extract text using OCR, in a worker thread so other requests keep being served
+    ocr_text = await asyncio.to_thread(extract_text, content)
     
     # Parse items from text
     raw_items = parse_items(ocr_text)
@@ -0,0 +1,133 @@
+import logging
+import os
+import shlex
+import tempfile
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Tesseract's OpenMP threads fight each other when several OCR jobs run at once;
+# must be set before libtesseract is loaded
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+import pytesseract
+from PIL import Image
+
+try:
+    import tesserocr  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    tesserocr = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# One engine per (thread, config): the Tesseract API is not thread-safe, and
+# keeping it alive avoids reloading the language model on every image
+_local = threading.local()
+_tesserocr_failed = False
+
+
+@lru_cache(maxsize=32)
+def _parse_config(config: str) -> Tuple[Optional[int], Optional[int], Tuple[Tuple[str, str], ...]]:
+    """Split a pytesseract-style config string into (oem, psm, variables)."""
+    oem = psm = None
+    variables = []
+    args = iter(shlex.split(config))
+    for arg in args:
+        if arg == "--oem":
+            oem = int(next(args))
+        elif arg == "--psm":
+            psm = int(next(args))
+        elif arg == "-c":
+            key, _, value = next(args).partition("=")
+            variables.append((key, value))
+    return oem, psm, tuple(variables)
+
+
+def _get_api(config: str):
+    apis: Dict[str, object] = getattr(_local, "apis", None)
+    if apis is None:
+        apis = _local.apis = {}
+    api = apis.get(config)
+    if api is None:
+        oem, psm, variables = _parse_config(config)
+        kwargs = {}
+        if oem is not None:
+            kwargs["oem"] = oem
+        if psm is not None:
+            kwargs["psm"] = psm
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        for key, value in variables:
+            api.SetVariable(key, value)
+        apis[config] = api
+    return api
+
+
+def _tesserocr_api(config: str):
+    """This thread's tesserocr engine for config, or None to use pytesseract."""
+    global _tesserocr_failed
+    if tesserocr is None or _tesserocr_failed:
+        return None
+    try:
+        return _get_api(config)
+    except RuntimeError as e:
+        # Usually missing tessdata; the tesseract binary may still work
+        _tesserocr_failed = True
+        logger.warning("tesserocr unavailable, falling back to pytesseract: %s", e)
+        return None
+
+
+def image_to_string(image: Image.Image, config: str = "") -> str:
+    """OCR an image in-process with tesserocr, falling back to pytesseract.
+
+    Accepts the same config string as ``pytesseract.image_to_string``
+    (``--oem``, ``--psm`` and ``-c key=value`` are honoured by tesserocr).
+    """
+    api = _tesserocr_api(config)
+    if api is None:
+        return pytesseract.image_to_string(image, config=config)
+    api.SetImage(image)
+    return api.GetUTF8Text()
+
+
+def images_to_strings(images: Sequence[Image.Image], config: str = "") -> List[str]:
+    """OCR several images with one engine load, returning one text per image.
+
+    Without tesserocr the images are written to a temporary directory and
+    handed to a single tesseract run as an image-list file; its per-page
+    output is split on the form-feed page separator.
+    """
+    if not images:
+        return []
+    if _tesserocr_api(config) is not None:
+        return [image_to_string(image, config) for image in images]
+    with tempfile.TemporaryDirectory(prefix="ocr-batch-") as tmp:
+        paths = []
+        for i, image in enumerate(images):
+            path = os.path.join(tmp, f"{i}.png")
+            image.save(path)
+            paths.append(path)
+        list_path = os.path.join(tmp, "images.txt")
+        with open(list_path, "w") as f:
+            f.write("\n".join(paths) + "\n")
+        pages = pytesseract.image_to_string(list_path, config=config).split("\f")
+    pages += [""] * (len(images) - len(pages))
+    return pages[:len(images)]
+
+
+def lines_to_string(image: Image.Image, boxes: Sequence[Tuple[int, int, int, int]], config: str = "") -> str:
+    """OCR each (left, top, right, bottom) box of image as its own text line.
+
+    Meant for a single-line config (``--psm 7``): Tesseract skips page layout
+    analysis and only recognises each row. tesserocr reuses one SetImage and
+    moves the rectangle; otherwise the crops go to one tesseract run.
+    """
+    api = _tesserocr_api(config)
+    if api is None:
+        texts = images_to_strings([image.crop(box) for box in boxes], config)
+    else:
+        api.SetImage(image)
+        texts = []
+        for left, top, right, bottom in boxes:
+            api.SetRectangle(left, top, right - left, bottom - top)
+            texts.append(api.GetUTF8Text())
+    return "\n".join(text.strip() for text in texts)
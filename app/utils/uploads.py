@@ -0,0 +1,45 @@
+import io
+
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MB
+# Slack for multipart boundaries and part headers around the file itself
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+async def reject_oversized_body(request: Request, call_next):
+    """HTTP middleware answering 413 from Content-Length alone.
+
+    FastAPI parses the whole multipart form before a handler runs, so this is
+    the only point where an obviously oversized upload can be refused unread.
+    """
+    content_length = request.headers.get("content-length", "")
+    limit = settings.max_upload_bytes + FORM_OVERHEAD_BYTES
+    if content_length.isdigit() and int(content_length) > limit:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"File too large. Maximum upload size is {settings.max_upload_bytes} bytes."},
+        )
+    return await call_next(request)
+
+
+async def read_upload(file: UploadFile, max_bytes: int, chunk_size: int = UPLOAD_CHUNK_SIZE) -> io.BytesIO:
+    """Stream an upload into memory, failing with 413 as soon as it exceeds max_bytes.
+
+    Returns a buffer rewound to the start so it can be handed straight to PIL.
+    """
+    buf = io.BytesIO()
+    size = 0
+    while chunk := await file.read(chunk_size):
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum upload size is {max_bytes} bytes.",
+            )
+        buf.write(chunk)
+    buf.seek(0)
+    return buf
@@ -1,22 +1,36 @@
 from typing import List, Dict
-import json
+from bisect import bisect_left
+import orjson
 
 def build_canonical_index(canonical_items_file: str) -> Dict[str, List[str]]:
-    with open(canonical_items_file, 'r') as file:
-        canonical_items = json.load(file)
+    with open(canonical_items_file, 'rb') as file:
+        canonical_items = orjson.loads(file.read())
+    if isinstance(canonical_items, dict):
+        canonical_items = canonical_items['canonical_items']
 
     index = {}
     for item in canonical_items:
-        normalized_name = item['name'].lower()
+        name = item['name'] if isinstance(item, dict) else item
+        normalized_name = name.lower()
         if normalized_name not in index:
             index[normalized_name] = []
-        index[normalized_name].append(item['name'])
+        index[normalized_name].append(name)
 
-    return index
+    # Sorted keys keep names sharing a prefix adjacent, as in a trie
+    return dict(sorted(index.items()))
+
+def names_with_prefix(sorted_keys: List[str], prefix: str) -> List[str]:
+    # Prefix query over the sorted index keys: a binary search to the first
+    # candidate, then a scan of the contiguous run that starts with prefix
+    prefix = prefix.lower()
+    start = end = bisect_left(sorted_keys, prefix)
+    while end < len(sorted_keys) and sorted_keys[end].startswith(prefix):
+        end += 1
+    return sorted_keys[start:end]
 
 if __name__ == "__main__":
     canonical_items_file = '../app/data/canonical_items.json'
     index = build_canonical_index(canonical_items_file)
-    
-    with open('../app/data/canonical_index.json', 'w') as index_file:
-        json.dump(index, index_file, indent=4)
\ No newline at end of file
+
+    with open('../app/data/canonical_index.json', 'wb') as index_file:
+        index_file.write(orjson.dumps(index, option=orjson.OPT_INDENT_2))
\ No newline at end of file
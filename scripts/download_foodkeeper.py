@@ -1,17 +1,19 @@
 import requests
-import json
+import orjson
 import os
 
 def download_foodkeeper_data():
     url = "https://www.foodsafety.gov/foodkeeper/downloads/FoodKeeperData.json"
-    response = requests.get(url)
+    with requests.get(url, stream=True, timeout=60) as response:
+        if response.status_code != 200:
+            print(f"Failed to download FoodKeeper data. Status code: {response.status_code}")
+            return
+        # Parsed once from the raw bytes; the body is released with the response
+        data = orjson.loads(response.content)
 
-    if response.status_code == 200:
-        with open(os.path.join(os.path.dirname(__file__), '../app/data/foodkeeper.json'), 'w') as f:
-            json.dump(response.json(), f, indent=4)
-        print("FoodKeeper data downloaded and saved as foodkeeper.json.")
-    else:
-        print(f"Failed to download FoodKeeper data. Status code: {response.status_code}")
+    with open(os.path.join(os.path.dirname(__file__), '../app/data/foodkeeper.json'), 'wb') as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    print("FoodKeeper data downloaded and saved as foodkeeper.json.")
 
 if __name__ == "__main__":
     download_foodkeeper_data()
\ No newline at end of file
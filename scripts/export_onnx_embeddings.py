@@ -0,0 +1,22 @@
+import sys
+
+from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from transformers import AutoTokenizer
+
+def export_onnx_embeddings(model_name: str, output_dir: str) -> None:
+    # Export the sentence-transformer to ONNX, then quantize its weights to int8
+    # (dynamic, VNNI kernels); point EMBEDDING_ONNX_PATH at output_dir to use it.
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    quantizer = ORTQuantizer.from_pretrained(model)
+    qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=output_dir, quantization_config=qconfig)
+    tokenizer.save_pretrained(output_dir)
+    print(f"Quantized model saved to {output_dir}/model_quantized.onnx")
+
+if __name__ == "__main__":
+    model_name = sys.argv[1] if len(sys.argv) > 1 else "intfloat/e5-small-v2"
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else "e5-onnx-int8"
+    export_onnx_embeddings(model_name, output_dir)
\ No newline at end of file
@@ -12,19 +12,27 @@ Run:
 
 from __future__ import annotations
 import argparse
-import json
+import orjson
 from pathlib import Path
 import re
 import sys
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 
 import pdfplumber  # type: ignore
 
+WS_RE = re.compile(r"\s+")
+NOT_RECOMMENDED_RE = re.compile(r"not recommended|do not|don't")
+# Unit abbreviations, expanded only as whole words ("mo" but not the "mo" in "months")
+ABBREVIATIONS = {"wks": "weeks", "wk": "week", "mos": "months", "mo": "month", "hrs": "hours", "hr": "hour"}
+ABBREV_RE = re.compile(r"(?<![a-z])(" + "|".join(ABBREVIATIONS) + r")(?![a-z])")
+# Examples: 3-5 days, 1 week, 2-3 months, 1-2 wks
+DUR_RE = re.compile(r"(\d+\s*(?:-|to)\s*\d+\s*(days?|weeks?|months?|hours?)|\d+\s*(days?|weeks?|months?|hours?)|\b\d+-\d+\b\s*(days?|weeks?|months?|hours?))")
+
 
 def norm_cell(s: Optional[str]) -> str:
     if s is None:
         return ""
-    s = re.sub(r"\s+", " ", s.strip())
+    s = WS_RE.sub(" ", s.strip())
     return s
 
 
@@ -32,21 +40,29 @@ def pick_duration(s: str) -> str:
     if not s:
         return ""
     low = s.lower()
-    if any(w in low for w in ["not recommended", "do not", "don't"]):
+    if NOT_RECOMMENDED_RE.search(low):
         return "Not recommended"
     # Examples: 3-5 days, 1 week, 2-3 months, 1-2 wks
-    # Normalize common abbreviations
-    low = low.replace("wks", "weeks").replace("wk", "week").replace("mos", "months").replace("mo", "month").replace("hrs", "hours").replace("hr", "hour")
+    # Normalize common abbreviations in one pass
+    low = ABBREV_RE.sub(lambda m: ABBREVIATIONS[m.group(1)], low)
     # Keep only a concise phrase (first clause)
-    m = re.search(r"(\d+\s*(?:-|to)\s*\d+\s*(days?|weeks?|months?|hours?)|\d+\s*(days?|weeks?|months?|hours?)|\b\d+-\d+\b\s*(days?|weeks?|months?|hours?))", low)
+    m = DUR_RE.search(low)
     if m:
         return m.group(0).replace(" to ", "-").strip()
     # Fallback: keep first 4 words
     return " ".join(low.split()[:4])
 
 
-def parse_pdf(pdf_path: Path) -> List[Dict[str, str]]:
-    rows: List[Dict[str, str]] = []
+def find_col(cols: List[str], keys: List[str]) -> int | None:
+    # Identify key columns by fuzzy matching
+    for i, c in enumerate(cols):
+        if any(k in c for k in keys):
+            return i
+    return None
+
+
+def iter_rows(pdf_path: Path) -> Iterator[Dict[str, str]]:
+    """Yield one row per table line with a duration, a page at a time"""
     with pdfplumber.open(pdf_path) as pdf:
         for page in pdf.pages:
             try:
@@ -59,17 +75,10 @@ def parse_pdf(pdf_path: Path) -> List[Dict[str, str]]:
                 # Header detection
                 header = [norm_cell(x) for x in tbl[0]]
                 cols = [h.lower() for h in header]
-                # Identify key columns by fuzzy matching
-                def find_col(keys: List[str]) -> int | None:
-                    for i, c in enumerate(cols):
-                        if any(k in c for k in keys):
-                            return i
-                    return None
-
-                i_item = find_col(["item", "food", "product"]) or 0
-                i_fridge = find_col(["refrigerator", "fridge"])
-                i_freezer = find_col(["freezer"])
-                i_pantry = find_col(["pantry", "room", "counter", "shelf"])  # optional
+                i_item = find_col(cols, ["item", "food", "product"]) or 0
+                i_fridge = find_col(cols, ["refrigerator", "fridge"])
+                i_freezer = find_col(cols, ["freezer"])
+                i_pantry = find_col(cols, ["pantry", "room", "counter", "shelf"])  # optional
 
                 # If there's no fridge and freezer, skip
                 if i_fridge is None and i_freezer is None and i_pantry is None:
@@ -88,16 +97,17 @@ def parse_pdf(pdf_path: Path) -> List[Dict[str, str]]:
                     # Ignore rows with no durations at all
                     if not any([pantry, fridge, freezer]):
                         continue
-                    rows.append({
+                    yield {
                         "name": item,
                         "pantry": pantry or "",
                         "fridge": fridge or "",
                         "freezer": freezer or "",
-                    })
-    return rows
+                    }
+            # Drop the page's parsed layout objects before moving on
+            page.flush_cache()
 
 
-def to_foodkeeper_schema(rows: List[Dict[str, str]]) -> Dict[str, List[Dict[str, object]]]:
+def to_foodkeeper_schema(rows: Iterable[Dict[str, str]]) -> Dict[str, List[Dict[str, object]]]:
     items = []
     seen = set()
     for r in rows:
@@ -128,13 +138,12 @@ def main() -> int:
         print(f"PDF not found: {pdf_path}", file=sys.stderr)
         return 2
 
-    rows = parse_pdf(pdf_path)
-    data = to_foodkeeper_schema(rows)
+    data = to_foodkeeper_schema(iter_rows(pdf_path))
 
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    with out_path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # orjson writes UTF-8 without escaping, like ensure_ascii=False
+    out_path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
     print(f"Wrote {len(data['items'])} items to {out_path}")
     return 0
 
@@ -2,8 +2,43 @@ import sys
 import os
 from pathlib import Path
 
+import pytest
+
 # Ensure imports like `from app.main import app` work when running pytest from the workspace root
 ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))
 # Ensure current working directory is the service root so relative test paths work
 os.chdir(ROOT)
+
+
+@pytest.fixture(scope="session")
+def ocr_service():
+    # One OCRService for the whole run: building it loads the OCR models
+    from app.services.ocr_service import OCRService
+    return OCRService()
+
+
+class FakeTesseract:
+    """Stands in for app.utils.tesseract.image_to_string: records
+    (mode, size, config) per call and returns text, or text(image) if callable"""
+
+    def __init__(self):
+        self.calls = []
+        self.text = ""
+
+    def __call__(self, image, config=""):
+        self.calls.append((image.mode, image.size, config))
+        return self.text(image) if callable(self.text) else self.text
+
+    @staticmethod
+    def fingerprint(image):
+        # OCR "text" that differs whenever the image handed to Tesseract does
+        return f"{image.mode} {image.size} {hash(image.tobytes())}"
+
+
+@pytest.fixture
+def fake_tesseract(monkeypatch):
+    fake = FakeTesseract()
+    monkeypatch.setattr("app.utils.tesseract.image_to_string", fake)
+    return fake
+
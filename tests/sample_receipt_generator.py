@@ -3,6 +3,8 @@ Sample grocery receipt generator for testing OCR and LLM parsing.
 Creates realistic receipt text samples with various formats and edge cases.
 """
 
+from types import MappingProxyType
+
 sample_receipts = {
     "walmart_receipt_1": """
 Walmart Supercenter
@@ -177,9 +179,13 @@ Toys, and Jewelry. 10/17/11-12/16/11
 """
 }
 
+# Read-only view for lookups; the fallback receipt is resolved once
+_RECEIPTS = MappingProxyType(sample_receipts)
+_DEFAULT_RECEIPT = sample_receipts["walmart_receipt_1"]
+
 def get_sample_receipt(receipt_name: str) -> str:
     """Get a sample receipt by name"""
-    return sample_receipts.get(receipt_name, sample_receipts["walmart_receipt_1"])
+    return _RECEIPTS.get(receipt_name, _DEFAULT_RECEIPT)
 
 def get_all_sample_receipts() -> dict:
     """Get all sample receipts"""
@@ -201,14 +207,11 @@ def create_test_image_from_text(text: str, filename: str):
     except:
         font = ImageFont.load_default()
     
-    # Wrap and draw text
-    lines = text.split('\n')
-    y_position = 50
-    
-    for line in lines:
-        if line.strip():
-            draw.text((50, y_position), line, fill='black', font=font)
-            y_position += 35
+    # Draw the non-blank lines 35px apart in one multiline call; Pillow
+    # advances each line by the height of "A" plus spacing
+    content = '\n'.join(line for line in text.split('\n') if line.strip())
+    spacing = 35 - draw.textbbox((0, 0), "A", font=font)[3]
+    draw.multiline_text((50, 50), content, fill='black', font=font, spacing=spacing)
     
     # Save image
     image.save(filename)
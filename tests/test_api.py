@@ -1,5 +1,6 @@
 from fastapi.testclient import TestClient
 from app.main import app
+from app.core.config import settings
 
 client = TestClient(app)
 
@@ -17,4 +18,9 @@ def test_process_receipt_invalid_file():
 def test_health_check():
     response = client.get("/api/v1/health")
     assert response.status_code == 200
-    assert response.json() == {"status": "ok"}
\ No newline at end of file
+    assert response.json() == {"status": "ok"}
+
+def test_process_receipt_too_large(monkeypatch):
+    monkeypatch.setattr(settings, "max_upload_bytes", 16)
+    response = client.post("/api/v1/process_receipt", files={"file": ("big.jpg", b"\xff" * 64, "image/jpeg")})
+    assert response.status_code == 413
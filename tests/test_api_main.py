@@ -0,0 +1,64 @@
+from fastapi.testclient import TestClient
+from app.api_main import app, match_food_item, is_skip_line
+
+def test_match_food_item_prefers_longest_alias():
+    food_name, shelf_life = match_food_item("GV WHOLE MILK 1GAL $3.28")
+    assert food_name == "Milk"
+    assert shelf_life["fridge"] == "1 week"
+
+def test_match_food_item_gv_peanut_butter():
+    food_name, _ = match_food_item("GV PNT BUTTR 007874237003 F 3.84 N")
+    assert food_name == "Peanut Butter"
+
+def test_match_food_item_partial_tokens():
+    assert match_food_item("LAND O LAKES SALTED")[0] == "Butter"
+    # Shared brand tokens and single-letter flags alone must not match anything
+    assert match_food_item("GV PARM 1602 F 4.98 O")[0] == "GV PARM 1602 F 4.98 O"
+
+def test_skip_lines():
+    assert is_skip_line("subtotal 40.66")
+    assert is_skip_line("eft debit pay from primary")
+    assert not is_skip_line("eggs 060538871459 f 1.88 o")
+
+def test_skip_store_code_lines():
+    # Walmart's store/operator/terminal line, with and without the '#'
+    assert is_skip_line("st 02345 op 009876 te 09 tr 01234")
+    assert is_skip_line("st# 02345 op# 009876 te# 09 tr# 01234")
+    assert not is_skip_line("gv whole milk 1gal 3.28")
+
+def test_food_database_etag():
+    client = TestClient(app)
+    response = client.get("/api/v1/food-database")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert any(item["name"] == "Milk" for item in response.json())
+
+    cached = client.get("/api/v1/food-database", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+def test_process_receipt_rejects_before_reading(monkeypatch):
+    from app.core.config import settings
+    client = TestClient(app)
+    response = client.post("/api/v1/receipt/process", files={"file": ("notes.txt", b"hello", "text/plain")})
+    assert response.status_code == 400
+    monkeypatch.setattr(settings, "max_upload_bytes", 16)
+    response = client.post("/api/v1/receipt/process", files={"file": ("big.jpg", b"\xff" * 100_000, "image/jpeg")})
+    assert response.status_code == 413
+
+def test_process_receipt_repeat_upload_skips_decoding(monkeypatch):
+    import app.api_main as api_main
+    prepared = []
+    monkeypatch.setattr(api_main, "OCR_CACHE", api_main.cachetools.LRUCache(maxsize=8))
+    monkeypatch.setattr(api_main, "prepare_for_ocr", lambda image, *args: prepared.append(image.size) or image.convert("L"))
+    monkeypatch.setattr(api_main, "image_to_string", lambda image, config="": "GV WHOLE MILK 1GAL 3.28")
+    client = TestClient(app)
+    with open("tests/sample_receipt.jpg", "rb") as f:
+        content = f.read()
+    responses = [
+        client.post("/api/v1/receipt/process", files={"file": ("receipt.jpg", content, "image/jpeg")}).json()
+        for _ in range(2)
+    ]
+    assert len(prepared) == 1
+    assert responses[0]["items"] == responses[1]["items"]
+    assert responses[0]["processing_info"] == responses[1]["processing_info"]
@@ -0,0 +1,6 @@
+from app.enhanced_main import extract_food_items
+
+def test_store_code_line_is_not_a_food_item():
+    items = extract_food_items("ST 02345 OP 009876 TE 09 TR 01234\nLAND O LAKES SALTED")
+    assert [item["food_name"] for item in items] == ["Butter"]
+    assert items[0]["raw_text"] == "LAND O LAKES SALTED"
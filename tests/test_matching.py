@@ -26,4 +26,65 @@ def test_matching_service():
     item_name = "UNKNOWN ITEM"
     match, suggestions = matching_service.match_item(item_name)
     assert match is None, "Expected no match for non-existent item"
-    assert len(suggestions) > 0, "Expected suggestions for non-existent item"
\ No newline at end of file
+    assert len(suggestions) > 0, "Expected suggestions for non-existent item"
+
+def test_match_items_matches_single_lookups():
+    matching_service = MatchingService()
+    item_names = ["YELLOW ONION 3LB", "GRN BELL PPR", "BLUBRY MNCH", "grn  bell ppr", "YELLOW ONION 3LB"]
+    assert matching_service.match_items(item_names) == [matching_service.match_item(n) for n in item_names]
+
+class _RecordingEmbedder:
+    """Scores each text as its own length, recording the batches it is asked for"""
+
+    def __init__(self, release):
+        self.batches = []
+        self.release = release
+
+    def top_k_batch(self, texts, k=3):
+        self.batches.append(list(texts))
+        self.release.wait(timeout=5)
+        return [[(text, float(len(text)))] * k for text in texts]
+
+def test_batching_embedder_returns_each_callers_rows():
+    import threading
+    from app.services.embedding_service import BatchingEmbedder
+
+    release = threading.Event()
+    service = _RecordingEmbedder(release)
+    batcher = BatchingEmbedder(service, max_batch_size=64, max_wait_time=0.05)
+    texts = [[f"item {i}", "x" * (i + 1)] for i in range(8)]
+    results = [None] * len(texts)
+
+    def call(i):
+        results[i] = batcher.top_k_batch(texts[i], k=1 + i % 3)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    # Hold the first batch until every caller's texts are being scored or queued
+    expected = sum(map(len, texts))
+    for _ in range(500):
+        scored = sum(map(len, service.batches))
+        if scored + 2 * batcher._queue.qsize() == expected:
+            break
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    for i, rows in enumerate(results):
+        assert rows == [[(text, float(len(text)))] * (1 + i % 3) for text in texts[i]]
+    # Callers queued behind the first were scored together
+    assert len(service.batches) <= 2
+
+def test_batching_embedder_does_not_hold_a_lone_request():
+    import threading
+    from app.services.embedding_service import BatchingEmbedder
+
+    release = threading.Event()
+    release.set()
+    batcher = BatchingEmbedder(_RecordingEmbedder(release), max_wait_time=60.0)
+    caller = threading.Thread(target=batcher.top_k_batch, args=(["milk"],))
+    caller.start()
+    caller.join(timeout=5)
+    assert not caller.is_alive()